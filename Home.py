@@ -3,7 +3,6 @@
 #===================
 
 import pandas as pd
-import inflection
 import numpy as np
 import streamlit as st
 import plotly.express as px
@@ -12,103 +11,30 @@ from PIL import Image
 import folium
 from streamlit_folium import folium_static
 
-#===================
-#Functions
-#===================
-
-#Changing country names
-COUNTRIES = {
-    1: "India",
-    14: "Australia",
-    30: "Brazil",
-    37: "Canada",
-    94: "Indonesia",
-    148: "New Zeland",
-    162: "Philippines",
-    166: "Qatar",
-    184: "Singapure",
-    189: "South Africa",
-    191: "Sri Lanka",
-    208: "Turkey",
-    214: "United Arab Emirates",
-    215: "England",
-    216: "United States of America",
-}
-def country_name(country_id):
-    return COUNTRIES[country_id]
-
-#Creating types for each food price
-
-def create_price_type(price_range):
-    if price_range == 1:
-        return "cheap"
-    elif price_range == 2:
-        return "normal"
-    elif price_range == 3:
-        return "expensive"
-    else:
-        return "gourmet"
-
-#Color names
-COLORS = {
-    "3F7E00": "darkgreen",
-    "5BA829": "green",
-    "9ACD32": "lightgreen",
-    "CDD614": "orange",
-    "FFBA00": "red",
-    "CBCBC8": "darkred",
-    "FF7800": "darkred",
-}
-
-def color_name(color_code):
-    return COLORS[color_code]
-
-#Renaming df columns
-def rename_columns(dataframe):
-    df = dataframe.copy()
-    title = lambda x: inflection.titleize(x)
-    snakecase = lambda x: inflection.underscore(x)
-    spaces = lambda x: x.replace(" ", "")
-    cols_old = list(df.columns)
-    cols_old = list(map(title, cols_old))
-    cols_old = list(map(spaces, cols_old))
-    cols_new = list(map(snakecase, cols_old))
-    df.columns = cols_new
-    return df
+from utils.loader import load_data, data_version
+from utils.filters import filter_index, shared_mask
+from utils.search import search_index
+from utils.queries import summary
+from utils.metadata import load_metadata
+from utils.sidebar import sidebar_filters, page_run, performance_panel
 
 #=================================================== Logic Structure =======================================================
 
+#Stage timings of this rerun, only recorded with PERF_INSTRUMENTATION=1 (see utils/instrument.py)
+run = page_run( 'Home' )
+
 #========================
 #Data Import and Cleaning
 #========================
 
-df = pd.read_csv( 'zomato.csv' )
-pd.set_option('display.max_columns', None)
-df1 = df.copy()
-
-#Source:https://www.kaggle.com/datasets/akashram/zomato-restaurants-autoupdated-dataset?resource=download&select=zomato.csv
-
-#Renaming colums
-df1 = rename_columns(df1)
-
-#Removing null values
-df1 = df1.dropna()
-
-#Removing duplicate rows
-df1 = df1.drop_duplicates()
-
-#Separating elements in 'Cuisines'
-df1['cuisines'] = df1.loc[:, 'cuisines'].astype(str).apply(lambda x: x.split(",")[0])
-
-#Creating 'Country' column
-df1['country'] = df1.loc[:, 'country_code'].apply(lambda x: country_name(x))
-
-#Creating 'Price Type' column
-df1['price_type'] = df1.loc[:, 'price_range'].apply(lambda x: create_price_type(x))
-
-#Swapping color codes with color names
-df1["color_name"] = df1.loc[:, "rating_color"].apply(lambda x: color_name(x))
+#Columns used by the search box, the full-text index is built once per process (see utils/search.py)
+SEARCH_COLUMNS = ['restaurant_id', 'restaurant_name', 'country', 'city', 'address', 'locality_verbose', 'cuisines', 'cuisine_list', 'aggregate_rating', 'average_cost_for_two', 'currency']
+df1 = load_data( SEARCH_COLUMNS )
+index = filter_index( df1 )
+search = search_index( df1 )
 
+#Option lists and rating range of the sidebars, computed once per dataset version (see utils/metadata.py)
+metadata = load_metadata()
 
 #=============================
 #Page Config
@@ -130,25 +56,15 @@ st.sidebar.markdown('# Find-A-Restaurant')
 st.sidebar.markdown('## Analyzing restaurants worldwide')
 st.sidebar.markdown("""---""")
 
-#Rating Filters
-rating_slider = st.sidebar.slider('Sort by Rating:', min_value=None, max_value=5.0, value=5.0, step=0.25, label_visibility="visible")
-
-selected_ratings = df1['aggregate_rating'] < rating_slider
-df1 = df1.loc[selected_ratings, :]
-st.sidebar.markdown("""---""")
+#Shared filters, applied with the form button and kept across pages
+filters = sidebar_filters( metadata )
+rating_slider, country_options = filters['rating_below'] , filters['country']
 
-#Country Filters
-country_options = st.sidebar.multiselect( 'Select Countries:', ['Philippines', 'Brazil', 'Australia', 'United States of America', 
-                                                               'Canada', 'Singapure', 'United Arab Emirates', 'India', 'Indonesia',
-                                                               'New Zeland', 'England', 'Qatar', 'South Africa','Sri Lanka', 'Turkey'],
-                    default=['Philippines', 'Brazil', 'Australia', 'United States of America', 'Canada', 'Singapure', 'United Arab Emirates',
-                             'India', 'Indonesia', 'New Zeland', 'England', 'Qatar', 'South Africa','Sri Lanka', 'Turkey'] )
+st.sidebar.markdown('###### For study, purposes by Helio Barbosa')
 
-selected_countries = df1['country'].isin( country_options )
-df1 = df1.loc[selected_countries, :]
-st.sidebar.markdown("""---""")
+#Metric tiles for the sidebar filters (see utils/queries.py)
+totals = summary( rating_below=rating_slider , country=country_options )
 
-st.sidebar.markdown('###### For study, purposes by Helio Barbosa')
 #===========================
 #Main
 #===========================
@@ -167,22 +83,34 @@ st.markdown("""---""")
 with st.container():
     col1, col2, col3, col4, col5 = st.columns( 5 )
     with col1:
-        df_aux=df1['restaurant_id'].nunique()
+        df_aux=totals['restaurants']
         st.metric('Restaurants' , df_aux )
     with col2:
-        df_aux=df1['country_code'].nunique()
+        df_aux=totals['countries']
         st.metric('Countries' , df_aux )
     with col3:
-        df_aux=df1['city'].nunique()
+        df_aux=totals['cities']
         st.metric('Cities' , df_aux )
     with col4:
-        df_aux=df1['cuisines'].nunique()
+        df_aux=totals['cuisines']
         st.metric('Cuisines' , df_aux )
     with col5:
-        df_aux=df1['votes'].sum()
+        df_aux=totals['votes']
         st.metric('Number of Ratings' , df_aux )
 st.markdown("""---""")
 
+with st.container():
+    st.subheader('Search restaurants')
+    query = st.text_input( 'Search by name, address, locality or cuisine:' , placeholder='e.g. sushi São Paulo' )
+    if query:
+        #Best matches for the sidebar filters, text relevance blended with the rating
+        results = search.search( query , k=20 , mask=shared_mask( index , data_version() , rating_below=rating_slider , country=country_options ) )
+        if len( results ):
+            st.dataframe( results.loc[:, ['restaurant_name', 'country', 'city', 'locality_verbose', 'cuisine_list', 'aggregate_rating', 'average_cost_for_two', 'currency']].reset_index( drop=True ) )
+        else:
+            st.markdown('No restaurant found for this search and the current filters')
+st.markdown("""---""")
+
 st.markdown(
     """
     To facilitate data-driven decisions, the Find-a-Restaurant project started. The project used the Zomato Restaurants database, which helps clients to find restaurants worldwide, informing the cuisines, addresses, booking information, and delivery information of restaurants; alongside a rating system.
@@ -191,7 +119,8 @@ st.markdown(
     
     - Home:
         - Overview of contents and this set of instructions;
-        - For quick insights, there is a country selector and a rating slider on the sidebar.
+        - For quick insights, there is a country selector and a rating slider on the sidebar;
+        - The search box finds restaurants by name, address, locality or cuisine, accents and typos included.
            
     - Countries:
         - Number of registered restaurants and cities on the database;
@@ -205,12 +134,19 @@ st.markdown(
         - Lists of top and bottom restaurants using the sidebar selection;
         - In the top section, there is a list of the top restaurants from popular cuisines;
         - The cuisine selection can be used to remove less popular cuisines for better analysis;
-        - IMPORTANT: Do not remove the popular cuisines from the sidebar to avoid errors.
+        - A popular cuisine with no restaurant left after filtering shows a notice instead of a restaurant.
     
     - World Map:
         - An interactive World Map with location pins containing descriptions;
         - The selection is limited by default to avoid performance issues in older systems.
+
+    - Nearby:
+        - The nearest restaurants to a city or to coordinates, or every restaurant within a radius;
+        - The sidebar filters also apply to the search.
     
     ### Ask for Help
     - @heliobtech - Author
-""")
\ No newline at end of file
+""")
+
+#Performance panel of this rerun, shown with PERF_INSTRUMENTATION=1
+performance_panel( run )
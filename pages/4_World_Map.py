@@ -3,112 +3,74 @@
 #===================
 
 import pandas as pd
-import inflection
 import numpy as np
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objs as go
 from PIL import Image
 import folium
-from streamlit_folium import folium_static
+from streamlit_folium import st_folium
+import streamlit.components.v1 as components
+
+from utils.loader import load_data, data_version
+from utils.cache import MAP_HTML, canonical_key
+from utils.filters import filter_index, shared_mask
+from utils.geo import grid_clusters, bounds_box, leaflet_bounds, feature_collection, DETAIL_ZOOM, MAX_MARKERS
+from utils.metadata import load_metadata
+from utils.sidebar import sidebar_filters, page_run, performance_panel
+from utils.instrument import instrumented, stage
 
 #===================
 #Functions
 #===================
 
-#Changing country names
-COUNTRIES = {
-    1: "India",
-    14: "Australia",
-    30: "Brazil",
-    37: "Canada",
-    94: "Indonesia",
-    148: "New Zeland",
-    162: "Philippines",
-    166: "Qatar",
-    184: "Singapure",
-    189: "South Africa",
-    191: "Sri Lanka",
-    208: "Turkey",
-    214: "United Arab Emirates",
-    215: "England",
-    216: "United States of America",
-}
-def country_name(country_id):
-    return COUNTRIES[country_id]
-
-#Creating types for each food price
-
-def create_price_type(price_range):
-    if price_range == 1:
-        return "cheap"
-    elif price_range == 2:
-        return "normal"
-    elif price_range == 3:
-        return "expensive"
-    else:
-        return "gourmet"
-
-#Color names
-COLORS = {
-    "3F7E00": "darkgreen",
-    "5BA829": "green",
-    "9ACD32": "lightgreen",
-    "CDD614": "orange",
-    "FFBA00": "red",
-    "CBCBC8": "darkred",
-    "FF7800": "darkred",
-}
-
-def color_name(color_code):
-    return COLORS[color_code]
-
-#Renaming df columns
-def rename_columns(dataframe):
-    df = dataframe.copy()
-    title = lambda x: inflection.titleize(x)
-    snakecase = lambda x: inflection.underscore(x)
-    spaces = lambda x: x.replace(" ", "")
-    cols_old = list(df.columns)
-    cols_old = list(map(title, cols_old))
-    cols_old = list(map(spaces, cols_old))
-    cols_new = list(map(snakecase, cols_old))
-    df.columns = cols_new
-    return df
+#Pins for the given restaurants, one GeoJSON layer drawn on canvas with client-side popups
+@instrumented( 'render' , rows_arg=1 )
+def add_markers(map, df_aux):
+    if len( df_aux ):
+        folium.GeoJson( feature_collection( df_aux , ['city', 'country', 'restaurant_name'] ),
+                        marker=folium.CircleMarker( radius=6 , fill=True , fill_opacity=0.8 ),
+                        popup=folium.GeoJsonPopup( fields=['city', 'country', 'restaurant_name'] , labels=False ) ).add_to( map )
+
+#Standalone HTML of a world map pinning every given restaurant
+@instrumented( 'render' )
+def render_pins(df_aux):
+    map = folium.Map( prefer_canvas=True )
+    add_markers( map , df_aux )
+    return folium.Figure().add_child( map ).render()
+
+#Rows matching the sidebar filters, through the precomputed indexes
+def select_rows(df1, rating_below, country, cuisines):
+    return shared_mask( filter_index( df1 ) , data_version() , rating_below=rating_below , country=country , cuisines=cuisines )
+
+#One circle per cluster, sized by its number of restaurants
+@instrumented( 'render' , rows_arg=1 )
+def add_clusters(map, df_aux):
+    if len( df_aux ):
+        df_aux = df_aux.assign( radius=8 + 4 * np.log10( df_aux['count'] ) )
+        folium.GeoJson( feature_collection( df_aux , ['count', 'radius'] ),
+                        marker=folium.CircleMarker( fill=True , fill_opacity=0.6 ),
+                        style_function=lambda feature: { 'radius': feature['properties']['radius'] },
+                        tooltip=folium.GeoJsonTooltip( fields=['count'] , aliases=['Restaurants:'] ) ).add_to( map )
 
 #=================================================== Logic Structure =======================================================
 
+#Stage timings of this rerun, only recorded with PERF_INSTRUMENTATION=1 (see utils/instrument.py)
+run = page_run( 'World Map' )
+
 #========================
 #Data Import and Cleaning
 #========================
 
-df = pd.read_csv( 'zomato.csv' )
-pd.set_option('display.max_columns', None)
-df1 = df.copy()
-
-#Source:https://www.kaggle.com/datasets/akashram/zomato-restaurants-autoupdated-dataset?resource=download&select=zomato.csv
-
-#Renaming colums
-df1 = rename_columns(df1)
-
-#Removing null values
-df1 = df1.dropna()
-
-#Removing duplicate rows
-df1 = df1.drop_duplicates()
-
-#Separating elements in 'Cuisines'
-df1['cuisines'] = df1.loc[:, 'cuisines'].astype(str).apply(lambda x: x.split(",")[0])
+#Columns used by this page, the loader drops the rest
+COLUMNS = ['restaurant_name', 'country', 'city', 'cuisines', 'cuisine_list', 'latitude', 'longitude', 'aggregate_rating']
 
-#Creating 'Country' column
-df1['country'] = df1.loc[:, 'country_code'].apply(lambda x: country_name(x))
+#Cleaned dataset, shared by every session (see utils/loader.py)
+df1 = load_data( COLUMNS )
 
-#Creating 'Price Type' column
-df1['price_type'] = df1.loc[:, 'price_range'].apply(lambda x: create_price_type(x))
-
-#Swapping color codes with color names
-df1["color_name"] = df1.loc[:, "rating_color"].apply(lambda x: color_name(x))
 
+#Option lists and rating range of the sidebars, computed once per dataset version (see utils/metadata.py)
+metadata = load_metadata()
 
 #=============================
 #Page Config
@@ -124,77 +86,59 @@ st.set_page_config(page_title='World Map', page_icon='🗺️', layout='wide')
 st.sidebar.header('Filters')
 st.sidebar.markdown("""---""")
 
-#Rating Filters
-rating_slider = st.sidebar.slider('Sort by Rating:', min_value=None, max_value=5.0, value=5.0, step=0.25, label_visibility="visible")
-
-selected_ratings = df1['aggregate_rating'] < rating_slider
-df1 = df1.loc[selected_ratings, :]
-st.sidebar.markdown("""---""")
-
-#Country Filters
-country_options = st.sidebar.multiselect( 'Select Countries:', ['Australia', 'Brazil', 'Canada', 'England', 'India', 'Indonesia',
-                                                               'New Zeland', 'Philippines', 'Qatar', 'Singapure', 'South Africa',
-                                                               'Sri Lanka', 'Turkey', 'United Arab Emirates',
-                                                               'United States of America'],                    
-                    default=['Brazil', 'Canada', 'England', 'Turkey', 'Indonesia', 'South Africa', 'Australia'] )
+#Shared filters, applied with the form button and kept across pages
+filters = sidebar_filters( metadata , countries=['Brazil', 'Canada', 'England', 'Turkey', 'Indonesia', 'South Africa', 'Australia'],
+                           cuisines=['Italian', 'Japanese', 'Brazilian', 'American', 'Fast Food', 'North Indian'] )
+rating_slider, country_options, cuisine_options = filters['rating_below'] , filters['country'] , filters['cuisines']
 
-selected_countries = df1['country'].isin( country_options )
-df1 = df1.loc[selected_countries, :]
-st.sidebar.markdown("""---""")
-
-#Cuisine Filter
-cuisine_options = st.sidebar.multiselect( 'Select Cuisines:', ['Afghan', 'African', 'American', 'Andhra', 'Arabian', 'Argentine',
-                                                               'Armenian', 'Asian', 'Asian Fusion', 'Assamese', 'Australian',
-                                                               'Author', 'Awadhi', 'BBQ', 'Bakery', 'Balti', 'Bar Food',
-                                                               'Belgian', 'Bengali', 'Beverages', 'Biryani', 'Brazilian',
-                                                               'Breakfast', 'British', 'Burger', 'Burmese', 'Cafe', 'Cafe Food',
-                                                               'Cajun', 'California', 'Canadian', 'Cantonese', 'Caribbean',
-                                                               'Charcoal Chicken', 'Chettinad', 'Chinese', 'Coffee',
-                                                               'Coffee and Tea', 'Contemporary', 'Continental', 'Creole',
-                                                               'Crepes', 'Cuban', 'Deli', 'Desserts', 'Dim Sum', 'Dimsum',
-                                                               'Diner', 'Donuts', 'Drinks Only', 'Durban', 'Döner',
-                                                               'Eastern European', 'Egyptian', 'European', 'Fast Food',
-                                                               'Filipino', 'Finger Food', 'Fish and Chips', 'French',
-                                                               'Fresh Fish', 'Fusion', 'German', 'Giblets', 'Goan',
-                                                               'Gourmet Fast Food', 'Greek', 'Grill', 'Gujarati', 'Hawaiian',
-                                                               'Healthy Food', 'Home-made', 'Hyderabadi', 'Ice Cream', 'Indian',
-                                                               'Indonesian', 'International', 'Iranian', 'Irish', 'Italian',
-                                                               'Izgara', 'Japanese', 'Juices', 'Kebab', 'Kerala', 'Khaleeji',
-                                                               'Kiwi', 'Kokoreç', 'Korean', 'Korean BBQ', 'Kumpir',
-                                                               'Latin American', 'Lebanese', 'Lucknowi', 'Maharashtrian',
-                                                               'Malaysian', 'Malwani', 'Mandi', 'Mangalorean', 'Mediterranean',
-                                                               'Mexican', 'Middle Eastern', 'Mineira', 'Mithai',
-                                                               'Modern Australian', 'Modern Indian', 'Momos', 'Mongolian',
-                                                               'Moroccan', 'Mughlai', 'Naga', 'Nepalese', 'New American',
-                                                               'New Mexican', 'North Eastern', 'North Indian', 'Old Turkish Bars',
-                                                               'Others', 'Ottoman', 'Pacific Northwest', 'Pakistani', 'Pan Asian',
-                                                               'Parsi', 'Patisserie', 'Peruvian', 'Pizza', 'Polish', 'Portuguese',
-                                                               'Pub Food', 'Rajasthani', 'Ramen', 'Restaurant Cafe',
-                                                               'Roast Chicken', 'Rolls', 'Russian', 'Salad', 'Sandwich',
-                                                               'Scottish', 'Seafood', 'Singaporean', 'South African',
-                                                               'South Indian', 'Southern', 'Southwestern', 'Spanish',
-                                                               'Sri Lankan', 'Steak', 'Street Food', 'Sunda', 'Sushi', 'Taco',
-                                                               'Taiwanese', 'Tapas', 'Tea', 'Tex-Mex', 'Thai', 'Tibetan',
-                                                               'Turkish', 'Turkish Pizza', 'Ukrainian', 'Vegetarian',
-                                                               'Vietnamese', 'Western', 'World Cuisine', 'Yum Cha'],
-                    default=['Italian', 'Japanese', 'Brazilian', 'American', 'Fast Food', 'North Indian'])
-
-selected_cuisines = df1['cuisines'].isin( cuisine_options )
-df1 = df1.loc[selected_cuisines, :]
+#Map Mode
+map_mode = st.sidebar.radio( 'Map mode:', ['Clusters', 'All pins'],
+                             help='Clusters groups nearby restaurants and only pins the ones in view. All pins draws every selected restaurant.' )
 st.sidebar.markdown("""---""")
 
 st.sidebar.markdown('###### For study, purposes by Helio Barbosa')
+
 #===========================
 #Main
 #===========================
 st.header('🗺️ World Map')
-st.markdown('Disclaimer: The selection is limited by default to avoid performance issues in older systems')
+st.markdown('Disclaimer: In "All pins" mode the selection is limited by default to avoid performance issues in older systems')
 st.markdown("""---""")
 
 with st.container():
-    map = folium.Map()
-    for index, location_info in df1.iterrows():
-     folium.Marker( [location_info['latitude'],
-     location_info['longitude']],
-     popup=location_info[['city', 'country', 'restaurant_name']] ).add_to( map )
-    folium_static(map, width=960, height=720)
\ No newline at end of file
+    if map_mode == 'All pins':
+        #Rendered once per dataset version and filter state and served from the disk cache afterwards,
+        #the rows are only selected when the map is rendered
+        key = canonical_key( 'world_map_pins' , ( data_version() , folium.__version__ ) ,
+                             rating_below=rating_slider , country=country_options , cuisines=cuisine_options )
+        html = MAP_HTML.get_or_compute( key , lambda: render_pins( df1.loc[select_rows( df1 , rating_slider , country_options , cuisine_options ), :] ) )
+        components.html( html , width=960 , height=730 )
+    else:
+        #Last viewport reported by the map, the whole world until the user pans or zooms
+        view = st.session_state.get( 'world_map_view' , { 'zoom': 2 , 'bounds': None } )
+        box = bounds_box( view['bounds'] )
+        center = [ ( box[0] + box[2] ) / 2 , ( box[1] + box[3] ) / 2 ] if box else [20, 0]
+
+        #Single pins once zoomed in or when few restaurants are in view, cluster centroids otherwise
+        clusters = grid_clusters( df1 )
+        selected_rows = select_rows( df1 , rating_slider , country_options , cuisine_options )
+        map = folium.Map( location=center , zoom_start=view['zoom'] , prefer_canvas=True )
+        in_view = clusters.in_view( selected_rows , box )
+        if view['zoom'] >= DETAIL_ZOOM or len( in_view ) <= MAX_MARKERS:
+            add_markers( map , df1.iloc[in_view] )
+        else:
+            add_clusters( map , clusters.clusters( view['zoom'] , selected_rows , box ) )
+
+        with stage( 'render: st_folium' ):
+            state = st_folium( map , key='world_map' , width=960 , height=720 , returned_objects=['bounds', 'zoom'] )
+
+        #A freshly mounted map reports its defaults, only a real pan/zoom moves the viewport
+        mounted = { 'bounds': leaflet_bounds( map.get_bounds() ) , 'zoom': view['zoom'] }
+        if state and state.get( 'zoom' ) is not None and state != mounted:
+            new_view = { 'zoom': state['zoom'] , 'bounds': state['bounds'] }
+            if new_view != view:
+                st.session_state['world_map_view'] = new_view
+                st.experimental_rerun()
+
+#Performance panel of this rerun, shown with PERF_INSTRUMENTATION=1
+performance_panel( run )
@@ -0,0 +1,125 @@
+#===================
+#Libraries
+#===================
+
+import pandas as pd
+import numpy as np
+import streamlit as st
+import plotly.express as px
+import plotly.graph_objs as go
+from PIL import Image
+import folium
+from streamlit_folium import folium_static
+
+from utils.loader import load_data, data_version
+from utils.filters import filter_index, shared_mask
+from utils.geo import spatial_index, feature_collection
+from utils.metadata import load_metadata
+from utils.sidebar import sidebar_filters, page_run, performance_panel
+from utils.instrument import instrumented, stage
+
+#===================
+#Functions
+#===================
+
+#Center of each city, the median of its restaurants coordinates
+def city_centers(df1):
+    df_aux = df1.loc[:, ['city', 'latitude', 'longitude']].groupby( 'city' , observed=True ).median()
+    return df_aux.sort_index()
+
+#Searched location plus one circle per restaurant found, as a single GeoJSON layer
+@instrumented( 'render' , rows_arg=2 )
+def add_results(map, location, df_aux):
+    folium.Marker( location , tooltip='Searched location' , icon=folium.Icon( color='red' ) ).add_to( map )
+    if len( df_aux ):
+        folium.GeoJson( feature_collection( df_aux , ['restaurant_name', 'city', 'distance_km'] ),
+                        marker=folium.CircleMarker( radius=6 , fill=True , fill_opacity=0.8 ),
+                        popup=folium.GeoJsonPopup( fields=['restaurant_name', 'city', 'distance_km'] , aliases=['Restaurant', 'City', 'Distance (km)'] ) ).add_to( map )
+
+#=================================================== Logic Structure =======================================================
+
+#Stage timings of this rerun, only recorded with PERF_INSTRUMENTATION=1 (see utils/instrument.py)
+run = page_run( 'Nearby' )
+
+#========================
+#Data Import and Cleaning
+#========================
+
+#Columns used by this page, the loader drops the rest
+COLUMNS = ['restaurant_id', 'restaurant_name', 'country', 'city', 'cuisines', 'cuisine_list', 'latitude', 'longitude', 'aggregate_rating', 'average_cost_for_two', 'currency']
+
+#Cleaned dataset, shared by every session (see utils/loader.py)
+df1 = load_data( COLUMNS )
+index = filter_index( df1 )
+spatial = spatial_index( df1 )
+centers = city_centers( df1 )
+
+
+#Option lists and rating range of the sidebars, computed once per dataset version (see utils/metadata.py)
+metadata = load_metadata()
+
+#=============================
+#Page Config
+#=============================
+
+#has to be the first st code
+st.set_page_config(page_title='Nearby', page_icon='📍', layout='wide')
+
+
+#============================
+#Sidebar
+#============================
+st.sidebar.header('Filters')
+st.sidebar.markdown("""---""")
+
+#Shared filters, applied with the form button and kept across pages
+filters = sidebar_filters( metadata , cuisines=None )
+rating_slider, country_options, cuisine_options = filters['rating_below'] , filters['country'] , filters['cuisines']
+
+st.sidebar.markdown('###### For study, purposes by Helio Barbosa')
+
+#Applying the sidebar filters through the precomputed indexes
+selected_rows = shared_mask( index , data_version() , rating_below=rating_slider , country=country_options , cuisines=cuisine_options )
+
+#===========================
+#Main
+#===========================
+st.header('📍 Nearby')
+st.markdown("""---""")
+
+with st.container():
+    col1, col2, col3 = st.columns( 3 )
+    with col1:
+        cities = list( centers.index )
+        city = st.selectbox( 'Start from a city:' , cities , index=cities.index( 'São Paulo' ) if 'São Paulo' in cities else 0 )
+    with col2:
+        latitude = st.number_input( 'Latitude:' , min_value=-90.0 , max_value=90.0 , value=float( centers.loc[city, 'latitude'] ) , format='%.5f' )
+    with col3:
+        longitude = st.number_input( 'Longitude:' , min_value=-180.0 , max_value=180.0 , value=float( centers.loc[city, 'longitude'] ) , format='%.5f' )
+
+    col1, col2 = st.columns( 2 )
+    with col1:
+        search_mode = st.radio( 'Search:' , ['Nearest restaurants', 'Within a radius'] , horizontal=True )
+    with col2:
+        if search_mode == 'Nearest restaurants':
+            k = st.slider( 'Number of restaurants:' , min_value=1 , max_value=50 , value=10 )
+            df_aux = spatial.nearest( latitude , longitude , k , mask=selected_rows )
+        else:
+            radius = st.slider( 'Radius (km):' , min_value=0.5 , max_value=50.0 , value=5.0 , step=0.5 )
+            df_aux = spatial.within( latitude , longitude , radius , mask=selected_rows )
+
+st.markdown("""---""")
+
+with st.container():
+    st.subheader( f'{len( df_aux )} restaurants found' )
+    st.dataframe( df_aux.loc[:, ['restaurant_name', 'city', 'cuisine_list', 'aggregate_rating', 'average_cost_for_two', 'currency', 'distance_km']].reset_index( drop=True ) )
+
+    map = folium.Map( location=[latitude, longitude] , zoom_start=13 , prefer_canvas=True )
+    add_results( map , [latitude, longitude] , df_aux )
+    if len( df_aux ):
+        map.fit_bounds( map.get_bounds() )
+    with stage( 'render: folium_static' ):
+        folium_static( map , width=960 , height=600 )
+
+#Performance panel of this rerun, shown with PERF_INSTRUMENTATION=1
+performance_panel( run )
@@ -0,0 +1,31 @@
+#===================
+#Libraries
+#===================
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+sys.path.insert( 0 , ROOT )
+
+#===================
+#Fixtures
+#===================
+
+#First rows of the bundled dataset, as read from zomato.csv
+@pytest.fixture( scope='session' )
+def raw():
+    return pd.read_csv( os.path.join( ROOT , 'zomato.csv' ) , nrows=600 )
+
+#Writing frames as csv files under the test's temporary directory, returns the path
+@pytest.fixture
+def write_csv(tmp_path):
+    def write(df, name='zomato.csv'):
+        path = tmp_path / name
+        path.parent.mkdir( parents=True , exist_ok=True )
+        df.to_csv( path , index=False )
+        return str( path )
+    return write
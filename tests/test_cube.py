@@ -0,0 +1,74 @@
+#===================
+#Libraries
+#===================
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import cube as cube_module
+from utils.aggregates import CITY_METRICS, COUNTRY_METRICS, CUISINE_METRICS, HOME_METRICS
+from utils.cube import UNKNOWN, RestaurantCube, restaurant_cube
+from utils.loader import clean_data
+
+#===================
+#Tests
+#===================
+
+#Aggregates the pages ask the cube for
+QUERIES = [ ( None , HOME_METRICS , None , {} ),
+            ( 'country' , COUNTRY_METRICS , 4.5 , {} ),
+            ( ['city', 'country'] , CITY_METRICS , None , {} ),
+            ( 'cuisines' , CUISINE_METRICS , None , { 'cuisines': ['Italian', 'Japanese', 'Filipino'] } ) ]
+
+@pytest.fixture( scope='module' )
+def df1(raw):
+    return clean_data( raw )
+
+def assert_same_aggregates(cube, expected):
+    for key, metrics, rating_below, selections in QUERIES:
+        got, want = cube.aggregate( key , metrics , rating_below , **selections ) , expected.aggregate( key , metrics , rating_below , **selections )
+        if key is None:
+            pd.testing.assert_series_equal( got , want )
+        else:
+            pd.testing.assert_frame_equal( got.sort_index() , want.sort_index() )
+
+def test_added_rows_match_a_rebuild(df1):
+    cube = RestaurantCube.from_frame( df1.iloc[:250] )
+    cube.add( df1.iloc[250:] )
+    assert_same_aggregates( cube , RestaurantCube.from_frame( df1 ) )
+
+def test_restaurants_seen_twice_are_counted_once(df1):
+    cube = RestaurantCube.from_frame( df1.iloc[:400] )
+    cube.add( df1.iloc[300:] )
+    assert not cube.ids_unique
+    totals = cube.aggregate( None , { 'restaurants': ( 'restaurant_id' , 'nunique' ) } )
+    assert totals['restaurants'] == df1['restaurant_id'].nunique()
+
+def test_unknown_countries_are_kept(df1):
+    unknown = df1.assign( country=df1['country'].mask( np.arange( len( df1 ) ) < 5 ) )
+    cube = RestaurantCube.from_frame( unknown )
+    totals = cube.aggregate( None , HOME_METRICS )
+    assert totals['restaurants'] == len( df1 )
+    assert totals['countries'] == unknown['country'].nunique()
+    assert UNKNOWN in cube.aggregate( 'country' , COUNTRY_METRICS ).index
+
+#A dataset version that only appends rows extends the previous cube, any other one is rebuilt
+def test_appended_versions_extend_the_previous_cube(df1, monkeypatch):
+    builds = []
+    from_frame = RestaurantCube.from_frame.__func__
+    monkeypatch.setattr( RestaurantCube , 'from_frame' , classmethod( lambda cls, frame, **kwargs: builds.append( len( frame ) ) or from_frame( cls , frame , **kwargs ) ) )
+    monkeypatch.setattr( cube_module , '_LATEST' , {} )
+
+    first = df1.iloc[:300].copy()
+    grown = df1.copy()
+    previous = restaurant_cube( first )
+    extended = restaurant_cube( grown )
+    assert builds == [300]
+    assert_same_aggregates( extended , from_frame( RestaurantCube , grown ) )
+    #The cube of the previous version is left as it was
+    assert_same_aggregates( previous , from_frame( RestaurantCube , first ) )
+
+    changed = grown.assign( votes=grown['votes'] + 1 )
+    assert_same_aggregates( restaurant_cube( changed ) , from_frame( RestaurantCube , changed ) )
+    assert builds == [300, len( df1 )]
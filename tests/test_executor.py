@@ -0,0 +1,87 @@
+#===================
+#Libraries
+#===================
+
+import threading
+
+import pandas as pd
+import pytest
+
+from utils.aggregates import CITY_METRICS, COUNTRY_METRICS, CUISINE_METRICS, HOME_METRICS
+from utils.cube import RestaurantCube
+from utils.executor import QueryExecutor
+from utils.loader import clean_data
+
+#===================
+#Tests
+#===================
+
+@pytest.fixture
+def executor():
+    executor = QueryExecutor( max_workers=1 )
+    yield executor
+    executor._pool.shutdown( wait=True )
+
+@pytest.fixture( scope='module' )
+def cube(raw):
+    return RestaurantCube.from_frame( clean_data( raw ) )
+
+#Future of a job holding the only worker until `release` is set
+def hold_worker(executor, release):
+    started = threading.Event()
+    def hold():
+        started.set()
+        release.wait( 5 )
+    future = executor.submit( 'hold' , hold )
+    assert started.wait( 5 )
+    return future
+
+def test_identical_requests_share_one_computation(executor):
+    release, calls = threading.Event() , []
+    def compute(x):
+        calls.append( x )
+        release.wait( 5 )
+        return x * 2
+    first = executor.submit( 'double' , compute , 21 )
+    others = [ executor.submit( 'double' , compute , 21 ) for _ in range( 5 ) ]
+    release.set()
+    assert all( future is first for future in others )
+    assert [ future.result( 5 ) for future in others ] == [42] * 5
+    assert calls == [21]
+    assert executor.stats()['coalesced'] == 5
+
+    #Once settled, the same request runs again
+    assert executor.submit( 'double' , compute , 21 ).result( 5 ) == 42
+    assert calls == [21, 21]
+    assert executor.stats()['in_flight'] == 0
+
+def test_errors_reach_every_waiting_request(executor):
+    release = threading.Event()
+    hold_worker( executor , release )
+    futures = [ executor.submit( 'fail' , lambda: 1 / 0 ) for _ in range( 3 ) ]
+    release.set()
+    for future in futures:
+        with pytest.raises( ZeroDivisionError ):
+            future.result( 5 )
+
+def test_queued_aggregates_match_direct_calls(executor, cube):
+    requests = [ ( None , HOME_METRICS , None , {} ),
+                 ( 'country' , COUNTRY_METRICS , 4.5 , {} ),
+                 ( ['city', 'country'] , CITY_METRICS , None , { 'country': ['India', 'Brazil'] } ),
+                 ( ['city', 'country'] , { 'votes': ( 'votes' , 'sum' ) } , None , { 'country': ['India', 'Brazil'] } ),
+                 ( 'cuisines' , CUISINE_METRICS , None , { 'cuisines': ['Italian', 'Japanese'] } ) ]
+    release = threading.Event()
+    hold_worker( executor , release )
+    futures = [ executor.submit_aggregate( cube , key , metrics , rating_below , **selections ) for key, metrics, rating_below, selections in requests ]
+    #An identical request joins the one already queued
+    assert executor.submit_aggregate( cube , *requests[1][:3] ) is futures[1]
+    release.set()
+
+    for future, ( key, metrics, rating_below, selections ) in zip( futures , requests ):
+        expected = cube.aggregate( key , metrics , rating_below , **selections )
+        if key is None:
+            pd.testing.assert_series_equal( future.result( 5 ) , expected )
+        else:
+            pd.testing.assert_frame_equal( future.result( 5 ) , expected )
+    stats = executor.stats()
+    assert ( stats['batches'] , stats['batched'] , stats['coalesced'] ) == ( 1 , len( requests ) , 1 )
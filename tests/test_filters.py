@@ -0,0 +1,25 @@
+#===================
+#Libraries
+#===================
+
+import numpy as np
+
+from utils.filters import filter_index
+from utils.loader import load_data
+from utils.queries import RESTAURANT_COLUMNS
+
+#===================
+#Tests
+#===================
+
+def test_projections_share_the_index_of_their_dataset():
+    full = load_data()
+    index = filter_index( full )
+    assert filter_index( load_data( RESTAURANT_COLUMNS ) ) is index
+    assert filter_index( load_data( ['restaurant_id', 'aggregate_rating'] ) ) is index
+
+def test_mask_matches_boolean_filters():
+    df1 = load_data( RESTAURANT_COLUMNS )
+    mask = filter_index( df1 ).mask( rating_below=4.0 , country=['Brazil', 'India'] , cuisines=['Italian'] )
+    expected = ( df1['aggregate_rating'] < 4.0 ) & df1['country'].isin( ['Brazil', 'India'] ) & df1['cuisine_list'].astype( str ).str.split( ',' ).apply( lambda names: 'Italian' in map( str.strip , names ) )
+    assert np.array_equal( mask , expected.to_numpy() )
@@ -0,0 +1,48 @@
+#===================
+#Libraries
+#===================
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.loader import clean_data, file_signature, ingest, read_snapshot, snapshot_path, stream_snapshot
+
+#===================
+#Tests
+#===================
+
+#Snapshot streamed from the csv, read back as a frame
+def streamed(path, chunk_rows):
+    signature = file_signature( path )
+    stream_snapshot( path , snapshot_path( path ) , signature , chunk_rows )
+    return read_snapshot( snapshot_path( path ) , signature )
+
+@pytest.mark.parametrize( 'chunk_rows' , [ 100_000 , 97 , 10 ] )
+def test_stream_snapshot_matches_clean_data(raw, write_csv, chunk_rows):
+    path = write_csv( pd.concat( [ raw , raw.iloc[::7] ] , ignore_index=True ) )
+    pd.testing.assert_frame_equal( streamed( path , chunk_rows ) , clean_data( pd.read_csv( path ) ) )
+
+def test_ingest_matches_clean_data(raw, write_csv):
+    path = write_csv( raw )
+    pd.testing.assert_frame_equal( ingest( path ) , clean_data( pd.read_csv( path ) ) )
+
+#First chunk only holds rows with nulls, the second only duplicates of the rows before it
+def test_stream_snapshot_empty_first_chunks(raw, write_csv):
+    nulls = raw.iloc[:20].assign( Cuisines=np.nan )
+    path = write_csv( pd.concat( [ nulls , raw.iloc[20:40] , raw.iloc[20:40] , raw.iloc[40:] ] , ignore_index=True ) )
+    pd.testing.assert_frame_equal( streamed( path , 20 ) , clean_data( pd.read_csv( path ) ) )
+
+def test_stream_snapshot_only_empty_chunks(raw, write_csv):
+    path = write_csv( raw.iloc[:30].assign( Cuisines=np.nan ) )
+    df1 = streamed( path , 10 )
+    assert len( df1 ) == 0
+    assert list( df1.columns ) == list( clean_data( pd.read_csv( path ) ).columns )
+
+#Rows that only differ below float32 precision are distinct rows, as they are for clean_data
+def test_stream_snapshot_fingerprints_before_downcast(raw, write_csv):
+    close = raw.iloc[:10].assign( Latitude=raw['Latitude'].iloc[:10] + 1e-9 )
+    path = write_csv( pd.concat( [ raw.iloc[:10] , close ] , ignore_index=True ) )
+    expected = clean_data( pd.read_csv( path ) )
+    assert len( expected ) == 2 * len( clean_data( raw.iloc[:10] ) )
+    pd.testing.assert_frame_equal( streamed( path , 10 ) , expected )
@@ -0,0 +1,90 @@
+#===================
+#Libraries
+#===================
+
+from contextlib import nullcontext
+
+import pytest
+
+from utils import queries, sidebar
+from utils.benchmark import PAGES, page_namespace
+from utils.cache import per_frame
+from utils.filters import filter_index
+from utils.loader import load_data
+from utils.metadata import DatasetMetadata
+
+#===================
+#Tests
+#===================
+
+#Sidebar widgets of a session: each widget returns the value the user set, or its starting value
+class Session:
+    LABELS = { 'Sort by Rating:': 'rating_below' , 'Select Countries:': 'country' , 'Select Cuisines:': 'cuisines' }
+
+    def __init__(self):
+        self.session_state = {}
+        self.sidebar = self
+        self.inputs = {}
+        self.submit = False
+
+    def form(self, key):
+        return nullcontext()
+
+    def markdown(self, *args, **kwargs):
+        pass
+
+    def slider(self, label, value=None, **kwargs):
+        return self.inputs.get( self.LABELS[label] , value )
+
+    def multiselect(self, label, options, default=None, **kwargs):
+        return list( self.inputs.get( self.LABELS[label] , default ) )
+
+    def form_submit_button(self, label):
+        return self.submit
+
+@pytest.fixture
+def session(monkeypatch):
+    session = Session()
+    monkeypatch.setattr( sidebar , 'st' , session )
+    return session
+
+@pytest.fixture( scope='module' )
+def metadata():
+    return per_frame( load_data() , DatasetMetadata )
+
+#Sidebar filters of a page, with the widgets the user set in `inputs`, and "Apply" pressed when `submit`
+def render(session, metadata, page, submit=False, **inputs):
+    session.inputs, session.submit = inputs , submit
+    return sidebar.sidebar_filters( metadata , **page_namespace( PAGES[page] )[1] )
+
+def apply(session, metadata, page, **inputs):
+    return render( session , metadata , page , submit=True , **inputs )
+
+def page_defaults(metadata, page):
+    return sidebar.default_filters( metadata , **page_namespace( PAGES[page] )[1] )
+
+def test_apply_without_changes_keeps_other_pages_at_their_defaults(session, metadata):
+    apply( session , metadata , 'nearby' )
+    apply( session , metadata , 'world_map' )
+    assert session.session_state[sidebar.FILTERS_KEY] == {}
+    for page in ('countries', 'cities', 'cuisines', 'world_map'):
+        assert render( session , metadata , page ) == page_defaults( metadata , page )
+
+def test_no_cuisine_means_every_cuisine(session, metadata):
+    assert render( session , metadata , 'nearby' )['cuisines'] is None
+    apply( session , metadata , 'cuisines' , cuisines=[] )
+    assert session.session_state[sidebar.FILTERS_KEY] == { 'cuisines': None }
+
+    #The world map then selects every cuisine of its countries, and the cuisines page every cuisine
+    filters = render( session , metadata , 'world_map' )
+    mask = filter_index( load_data() ).mask( rating_below=filters['rating_below'] , country=filters['country'] , cuisines=filters['cuisines'] )
+    assert filters['cuisines'] is None and mask.sum() > 0
+    filters = render( session , metadata , 'cuisines' )
+    assert len( queries.cuisine_metrics( rating_below=filters['rating_below'] , country=filters['country'] , cuisines=metadata.options('cuisines') ) ) > 0
+
+def test_changed_filters_carry_over(session, metadata):
+    apply( session , metadata , 'home' , country=['Brazil'] , rating_below=4.0 )
+    assert session.session_state[sidebar.FILTERS_KEY] == { 'country': ['Brazil'] , 'rating_below': 4.0 }
+    filters = render( session , metadata , 'world_map' )
+    assert ( filters['country'] , filters['rating_below'] ) == ( ['Brazil'] , 4.0 )
+    assert filters['cuisines'] == page_defaults( metadata , 'world_map' )['cuisines']
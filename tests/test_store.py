@@ -0,0 +1,55 @@
+#===================
+#Libraries
+#===================
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.loader import build_store, clean_data, ingest, ingest_shards, read_store
+
+#===================
+#Tests
+#===================
+
+#Csv of the rows as a single file and as `shards` files of consecutive rows, returns both paths
+@pytest.fixture
+def feed(write_csv, tmp_path):
+    def split(df, shards=3):
+        single = write_csv( df , 'single.csv' )
+        for i, part in enumerate( np.array_split( df , shards ) ):
+            write_csv( part , f'feed/part{i}.csv' )
+        return single , str( tmp_path / 'feed' )
+    return split
+
+#Cleaned single csv, with the range index of a store
+def single_csv(path):
+    return clean_data( pd.read_csv( path ) ).reset_index( drop=True )
+
+@pytest.mark.parametrize( 'workers' , [ 1 , 2 ] )
+def test_sharded_ingest_matches_single_csv(raw, feed, workers):
+    single, directory = feed( raw )
+    pd.testing.assert_frame_equal( ingest_shards( directory , workers ) , single_csv( single ) )
+
+def test_ingest_of_a_directory_reads_its_store(raw, feed):
+    single, directory = feed( raw )
+    pd.testing.assert_frame_equal( ingest( directory ) , single_csv( single ) )
+    assert build_store( directory ) == []
+
+def test_duplicate_shards_keep_the_first_row_of_each_restaurant(raw, feed, write_csv):
+    single, directory = feed( raw )
+    write_csv( raw , 'feed/zcopy.csv' )
+    pd.testing.assert_frame_equal( ingest_shards( directory , 1 ) , single_csv( single ) )
+
+def test_only_changed_and_deleted_shards_are_rebuilt(raw, feed, write_csv):
+    single, directory = feed( raw )
+    ingest_shards( directory , 1 )
+    parts = np.array_split( raw , 3 )
+    write_csv( parts[1].iloc[::2] , 'feed/part1.csv' )
+    os.remove( os.path.join( directory , 'part2.csv' ) )
+    assert read_store( directory ) is None
+    assert build_store( directory , 1 ) == ['part1.csv']
+    expected = single_csv( write_csv( pd.concat( [ parts[0] , parts[1].iloc[::2] ] ) , 'expected.csv' ) )
+    pd.testing.assert_frame_equal( read_store( directory ) , expected )
@@ -0,0 +1,118 @@
+#===================
+#Libraries
+#===================
+
+import numpy as np
+import pandas as pd
+
+#===================
+#Functions
+#===================
+
+#Metrics computed by the Countries page, as {output column: (source column, function)}
+COUNTRY_METRICS = {
+    'restaurant_id': ('restaurant_id', 'nunique'),
+    'city': ('city', 'nunique'),
+    'cuisines': ('cuisines', 'nunique'),
+    'votes': ('votes', 'mean'),
+    'aggregate_rating': ('aggregate_rating', 'mean'),
+    'average_cost_for_two': ('average_cost_for_two', 'mean'),
+}
+
+#Home page tiles, computed over the whole selection
+HOME_METRICS = {
+    'restaurants': ('restaurant_id', 'nunique'),
+    'countries': ('country', 'nunique'),
+    'cities': ('city', 'nunique'),
+    'cuisines': ('cuisines', 'nunique'),
+    'votes': ('votes', 'sum'),
+}
+
+#Cities page charts, per (city, country)
+CITY_METRICS = {
+    'restaurant_id': ('restaurant_id', 'nunique'),
+    'cuisines': ('cuisines', 'nunique'),
+}
+
+#Cuisines page charts, per cuisine
+CUISINE_METRICS = {
+    'aggregate_rating': ('aggregate_rating', 'mean'),
+    'average_cost_for_two': ('average_cost_for_two', 'mean'),
+}
+
+#Distinct non-null values of `values` per group, from one hash pass over (group, value) pairs
+def _group_nunique(codes, values, n_groups):
+    value_codes, value_uniques = pd.factorize( values )
+    valid = value_codes >= 0
+    pairs = codes[valid].astype( np.int64 ) * len( value_uniques ) + value_codes[valid]
+    distinct = pd.unique( pairs )
+    if len( value_uniques ) == 0:
+        return np.zeros( n_groups , dtype=np.int64 )
+    return np.bincount( distinct // len( value_uniques ) , minlength=n_groups )
+
+#Group codes for several key columns, sorted like groupby(keys)
+#Each key is factorized on its own and the codes are combined in mixed radix
+def _factorize_keys(df, keys):
+    combined = np.zeros( len( df ) , dtype=np.int64 )
+    valid = np.ones( len( df ) , dtype=bool )
+    levels = []
+    for k in keys:
+        key_codes, uniques = pd.factorize( df[k] , sort=True )
+        valid &= key_codes >= 0
+        combined = combined * max( len( uniques ) , 1 ) + key_codes
+        levels.append( uniques )
+    codes = np.full( len( df ) , -1 , dtype=np.intp )
+    codes[valid], combined_uniques = pd.factorize( combined[valid] , sort=True )
+    level_codes = []
+    for uniques in reversed( levels ):
+        size = max( len( uniques ) , 1 )
+        level_codes.append( combined_uniques % size )
+        combined_uniques = combined_uniques // size
+    index = pd.MultiIndex( levels=[ pd.Index( u ) for u in levels ] , codes=list( reversed( level_codes ) ) , names=keys )
+    return codes, index
+
+#Mean per group, with a second pass over the residuals to correct the float64 rounding of the sums
+def _group_mean(codes, values, counts, n_groups):
+    with np.errstate( invalid='ignore' , divide='ignore' ):
+        mean = np.bincount( codes , weights=values , minlength=n_groups ) / counts
+        if len( codes ):
+            mean = mean + np.bincount( codes , weights=values - mean[codes] , minlength=n_groups ) / counts
+    return mean
+
+#Aggregates of already grouped values
+#codes: group of each value (0..len(index)-1), column(col): values of `col` aligned with codes
+def aggregate_codes(codes, index, column, metrics):
+    n_groups = len( index )
+    counts = np.bincount( codes , minlength=n_groups )
+
+    result = {}
+    for name, (col, func) in metrics.items():
+        if func == 'count':
+            result[name] = counts
+            continue
+        values = column( col )
+        if func == 'sum':
+            sums = np.bincount( codes , weights=values , minlength=n_groups )
+            result[name] = sums.astype( np.int64 ) if np.issubdtype( values.dtype , np.integer ) else sums
+        elif func == 'mean':
+            result[name] = _group_mean( codes , values , counts , n_groups )
+        elif func == 'nunique':
+            result[name] = _group_nunique( codes , values , n_groups )
+        else:
+            raise ValueError( f'Unknown aggregate {func!r} for column {col!r}' )
+
+    return pd.DataFrame( result , index=index )
+
+#Several aggregates per group in a single grouped pass, like
+#df.groupby(key, observed=True).agg(**metrics) but with one factorization of the key
+#metrics: {output column: (source column, 'count' | 'sum' | 'mean' | 'nunique')}
+#key can be a column or a list of columns, groups come out sorted by key
+#Rows with a null key are dropped
+def group_aggregate(df, key, metrics):
+    if isinstance( key , (list, tuple) ):
+        codes, index = _factorize_keys( df , list( key ) )
+    else:
+        codes, uniques = pd.factorize( df[key] , sort=True )
+        index = pd.Index( uniques , name=key )
+    valid = codes >= 0
+    return aggregate_codes( codes[valid] , index , lambda col: df[col].to_numpy()[valid] , metrics )
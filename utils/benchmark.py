@@ -0,0 +1,239 @@
+#===================
+#Libraries
+#===================
+
+import argparse
+import ast
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import folium
+
+from utils.loader import CSV_PATH, rename_columns, clean_data, file_signature, snapshot_path, write_snapshot, read_snapshot, stream_snapshot, load_data, project, clear_cache
+from utils.memory import downcast
+from utils.cache import per_frame
+from utils.aggregates import group_aggregate, HOME_METRICS, COUNTRY_METRICS, CITY_METRICS, CUISINE_METRICS
+from utils.cuisines import CuisineMap
+from utils.filters import FilterIndex, filter_index
+from utils.cube import RestaurantCube, restaurant_cube
+from utils.metadata import DatasetMetadata
+from utils.topk import CuisineRanking, cuisine_ranking, top_k, RESTAURANT_ORDER, RESTAURANT_ASCENDING
+from utils.search import SearchIndex, search_index
+from utils.geo import GridClusters, SpatialIndex, grid_clusters, spatial_index
+from utils.sidebar import default_filters
+from utils.synthetic import write_csv
+from utils.queries import RESTAURANT_COLUMNS
+
+#===================
+#Functions
+#===================
+
+ROOT = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+PAGES = {
+    'home': os.path.join( ROOT , 'Home.py' ),
+    'countries': os.path.join( ROOT , 'pages' , '1_Countries.py' ),
+    'cities': os.path.join( ROOT , 'pages' , '2_Cities.py' ),
+    'cuisines': os.path.join( ROOT , 'pages' , '3_Cuisines.py' ),
+    'world_map': os.path.join( ROOT , 'pages' , '4_World_Map.py' ),
+    'nearby': os.path.join( ROOT , 'pages' , '5_Nearby.py' ),
+}
+
+#Timings of the stages of one dataset, each stage runs `repeat` times and keeps min/median/mean
+class Benchmark:
+    def __init__(self, repeat=3):
+        self.repeat = repeat
+        self.stages = []
+
+    #Running fn `repeat` times and recording its timings under `name`, returns the last result
+    def stage(self, name, fn, rows=None):
+        times = []
+        for _ in range( self.repeat ):
+            start = time.perf_counter()
+            result = fn()
+            times.append( ( time.perf_counter() - start ) * 1000 )
+        self.stages.append( { 'stage': name , 'rows': rows , 'repeat': len( times ) ,
+                              'min_ms': round( min( times ) , 3 ) , 'median_ms': round( statistics.median( times ) , 3 ) ,
+                              'mean_ms': round( statistics.fmean( times ) , 3 ) } )
+        return result
+
+#Functions, imports and literal constants of a page, without running its Streamlit code
+#Also returns the keyword arguments of its sidebar_filters call, i.e. the page's default filters
+def page_namespace(path):
+    with open( path , encoding='utf-8' ) as file:
+        tree = ast.parse( file.read() , filename=path )
+    kept, sidebar = [], {}
+    for node in tree.body:
+        if isinstance( node , (ast.Import, ast.ImportFrom, ast.FunctionDef) ):
+            kept.append( node )
+        elif isinstance( node , ast.Assign ):
+            try:
+                ast.literal_eval( node.value )
+                kept.append( node )
+            except ValueError:
+                pass
+    for node in ast.walk( tree ):
+        if isinstance( node , ast.Call ) and getattr( node.func , 'id' , None ) == 'sidebar_filters':
+            sidebar = { kw.arg: ast.literal_eval( kw.value ) for kw in node.keywords }
+    namespace = { '__name__': 'benchmark_page' , '__file__': path }
+    exec( compile( ast.Module( body=kept , type_ignores=[] ) , path , 'exec' ) , namespace )
+    return namespace, sidebar
+
+#Rendered HTML of a folium map, what the page sends to the browser
+def render_map(map):
+    return folium.Figure().add_child( map ).render()
+
+#Load, clean and snapshot stages of a csv
+def bench_load(bench, path):
+    raw = bench.stage( 'load.read_csv' , lambda: pd.read_csv( path ) )
+    bench.stage( 'load.rename_columns' , lambda: rename_columns( raw ) , rows=len( raw ) )
+    df1 = bench.stage( 'load.clean_data' , lambda: clean_data( raw ) , rows=len( raw ) )
+    signature = file_signature( path )
+    bench.stage( 'load.write_snapshot' , lambda: write_snapshot( df1 , snapshot_path( path ) , signature ) , rows=len( df1 ) )
+    bench.stage( 'load.read_snapshot' , lambda: read_snapshot( snapshot_path( path ) , signature ) , rows=len( df1 ) )
+    bench.stage( 'load.stream_snapshot' , lambda: stream_snapshot( path , snapshot_path( path ) , signature ) , rows=len( raw ) )
+    df1 = bench.stage( 'load.downcast' , lambda: downcast( df1 ) , rows=len( df1 ) )
+    return raw, df1
+
+#Building every shared structure from scratch on the full cleaned frame
+def bench_build(bench, df1):
+    rows = len( df1 )
+    bench.stage( 'build.cuisine_map' , lambda: CuisineMap( df1 ) , rows=rows )
+    bench.stage( 'build.filter_index' , lambda: FilterIndex( df1 ) , rows=rows )
+    bench.stage( 'build.cube' , lambda: RestaurantCube.from_frame( df1 ) , rows=rows )
+    bench.stage( 'build.metadata' , lambda: DatasetMetadata( df1 ) , rows=rows )
+    bench.stage( 'build.cuisine_ranking' , lambda: CuisineRanking( df1 ) , rows=rows )
+    bench.stage( 'build.search_index' , lambda: SearchIndex( df1 ) , rows=rows )
+    bench.stage( 'build.spatial_index' , lambda: SpatialIndex( df1 ) , rows=rows )
+    bench.stage( 'build.grid_clusters' , lambda: GridClusters( df1 ) , rows=rows )
+
+#Sidebar filtering, aggregates, chart builders and maps of each page with its default filters
+#Shared structures are built once beforehand, as they are in a running app
+def bench_pages(bench, path, df1):
+    metadata = per_frame( df1 , DatasetMetadata )
+    cube = restaurant_cube( df1 )
+    for page, page_path in PAGES.items():
+        ns, sidebar = page_namespace( page_path )
+        #Cities and Cuisines read their rows through utils/queries.py
+        columns = RESTAURANT_COLUMNS if page in ('cities', 'cuisines') else ns.get( 'COLUMNS' , ns.get( 'SEARCH_COLUMNS' ) )
+        if columns is not None:
+            bench.stage( f'{page}.load_columns' , lambda: project( df1 , columns ) , rows=len( df1 ) )
+        frame = load_data( columns , path=path )
+        index = filter_index( frame )
+        filters = default_filters( metadata , **sidebar )
+        rating_below, country, cuisines = filters['rating_below'] , filters['country'] , filters['cuisines']
+        if page == 'cuisines':
+            cuisines = [ c for c in cuisines or metadata.options('cuisines') if c not in ns['NO_REVIEWS'] ]
+        selections = { 'rating_below': rating_below , 'country': country }
+        if cuisines is not None:
+            selections['cuisines'] = cuisines
+        mask = bench.stage( f'{page}.filter' , lambda: index.mask( **selections ) , rows=len( frame ) )
+
+        if page == 'home':
+            bench.stage( 'home.aggregate' , lambda: cube.aggregate( None , HOME_METRICS , rating_below=rating_below , country=country ) )
+            search = search_index( frame )
+            bench.stage( 'home.search' , lambda: search.search( 'sushi sao paulo' , k=20 , mask=mask ) )
+        elif page == 'countries':
+            metrics = bench.stage( 'countries.aggregate' , lambda: cube.aggregate( 'country' , COUNTRY_METRICS , rating_below=rating_below , country=country ) )
+            for name in ['country_rest', 'country_cities', 'country_vote_mean', 'country_mean_rate', 'country_cuisines', 'country_cost_two']:
+                bench.stage( f'countries.{name}' , lambda: ns[name]( metrics ) )
+        elif page == 'cities':
+            rated_above = bench.stage( 'cities.rated_above' , lambda: group_aggregate( frame.loc[mask & ( frame['aggregate_rating'].to_numpy() > 4.0 ), ['restaurant_id','city','country']] ,
+                                                                                 ['city','country'] , { 'restaurant_id': ( 'restaurant_id' , 'nunique' ) } ) , rows=len( frame ) )
+            city_metrics = bench.stage( 'cities.aggregate' , lambda: cube.aggregate( ['city','country'] , CITY_METRICS , country=country ) )
+            low_rated = bench.stage( 'cities.aggregate_low_rated' , lambda: cube.aggregate( ['city','country'] , CITY_METRICS , rating_below=2.5 , country=country ) )
+            bench.stage( 'cities.top_cities_rest' , lambda: ns['top_cities_rest']( city_metrics ) )
+            bench.stage( 'cities.top_rest_rate' , lambda: ns['top_rest_rate']( rated_above ) )
+            bench.stage( 'cities.bot_rest_rate' , lambda: ns['bot_rest_rate']( low_rated ) )
+            bench.stage( 'cities.top_cuisines_city' , lambda: ns['top_cuisines_city']( city_metrics ) )
+        elif page == 'cuisines':
+            metrics = bench.stage( 'cuisines.aggregate' , lambda: cube.aggregate( 'cuisines' , CUISINE_METRICS , rating_below=rating_below , cuisines=cuisines , country=country ) )
+            ranking = cuisine_ranking( frame )
+            bench.stage( 'cuisines.cuisine_top_rest' , lambda: [ ranking.best( c , mask ) for c in ns['POPULAR_CUISINES'] ] )
+            bench.stage( 'cuisines.top_restaurants' , lambda: top_k( frame.loc[mask, :] , RESTAURANT_ORDER , 10 , RESTAURANT_ASCENDING ) , rows=len( frame ) )
+            bench.stage( 'cuisines.cuisines_top' , lambda: ns['cuisines_top']( metrics ) )
+            bench.stage( 'cuisines.cuisines_bot' , lambda: ns['cuisines_bot']( metrics ) )
+        elif page == 'world_map':
+            clusters = grid_clusters( frame )
+            selected = frame.loc[mask, :]
+            bench.stage( 'world_map.pins' , lambda: ns['render_pins']( selected ) , rows=len( selected ) )
+            def clustered():
+                map = folium.Map( location=[20, 0] , zoom_start=2 , prefer_canvas=True )
+                ns['add_clusters']( map , clusters.clusters( 2 , mask ) )
+                return render_map( map )
+            bench.stage( 'world_map.clusters' , clustered , rows=int( mask.sum() ) )
+        elif page == 'nearby':
+            centers = bench.stage( 'nearby.city_centers' , lambda: ns['city_centers']( frame ) , rows=len( frame ) )
+            spatial = spatial_index( frame )
+            location = [ float( centers['latitude'].iloc[0] ) , float( centers['longitude'].iloc[0] ) ]
+            found = bench.stage( 'nearby.nearest' , lambda: spatial.nearest( location[0] , location[1] , 10 , mask=mask ) )
+            bench.stage( 'nearby.within' , lambda: spatial.within( location[0] , location[1] , 5.0 , mask=mask ) )
+            def results_map():
+                map = folium.Map( location=location , zoom_start=13 , prefer_canvas=True )
+                ns['add_results']( map , location , found )
+                return render_map( map )
+            bench.stage( 'nearby.map' , results_map , rows=len( found ) )
+
+#Every stage for the bundled csv (factor 1) or a synthetic one `factor` times its size (see utils/synthetic.py)
+#The csv is written to `workdir` first, which is not timed
+def run_scale(factor, workdir, repeat=3, seed=0, source=CSV_PATH):
+    path = os.path.join( workdir , f'zomato_x{factor}.csv' )
+    if factor == 1:
+        shutil.copyfile( source , path )
+    else:
+        write_csv( path , factor * len( pd.read_csv( source , usecols=[0] ) ) , seed=seed )
+
+    bench = Benchmark( repeat )
+    clear_cache()
+    raw, df1 = bench_load( bench , path )
+    bench_build( bench , df1 )
+    df1 = load_data( path=path )
+    bench_pages( bench , path , df1 )
+    clear_cache()
+    return { 'scale': factor , 'csv_bytes': os.path.getsize( path ) , 'raw_rows': len( raw ) , 'rows': len( df1 ) , 'stages': bench.stages }
+
+#Environment of a run, so results from different machines and commits can be told apart
+def environment():
+    try:
+        commit = subprocess.run( ['git', 'rev-parse', 'HEAD'] , cwd=ROOT , capture_output=True , text=True , check=True ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    versions = {}
+    for name in ['pandas', 'numpy', 'pyarrow', 'folium', 'plotly', 'streamlit']:
+        try:
+            versions[name] = __import__( name ).__version__
+        except ImportError:
+            versions[name] = None
+    return { 'created': datetime.datetime.now( datetime.timezone.utc ).isoformat( timespec='seconds' ) ,
+             'commit': commit , 'python': platform.python_version() , 'platform': platform.platform() ,
+             'cpus': os.cpu_count() , 'versions': versions }
+
+#Headless benchmark of every stage, as JSON: python -m utils.benchmark [--scales 1,10,100,1000] [--repeat 3] [--seed 0] [--output results.json]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Time the load, clean, filter, aggregate, chart and map stages of the dashboard.' )
+    parser.add_argument( '--scales' , default='1,10' , help='comma-separated multiples of the bundled csv, e.g. 1,10,100,1000' )
+    parser.add_argument( '--repeat' , type=int , default=3 , help='runs per stage' )
+    parser.add_argument( '--seed' , type=int , default=0 , help='seed of the synthetic datasets' )
+    parser.add_argument( '--output' , help='JSON file to write, stdout when omitted' )
+    args = parser.parse_args()
+
+    results = { **environment() , 'repeat': args.repeat , 'seed': args.seed , 'runs': [] }
+    with tempfile.TemporaryDirectory( prefix='find_a_restaurant_bench_' ) as workdir:
+        for factor in [ int( scale ) for scale in args.scales.split(',') ]:
+            print( f'scale x{factor}...' , file=sys.stderr )
+            results['runs'].append( run_scale( factor , workdir , args.repeat , args.seed ) )
+
+    text = json.dumps( results , indent=2 )
+    if args.output:
+        with open( args.output , 'w' ) as file:
+            file.write( text + '\n' )
+    else:
+        print( text )
@@ -0,0 +1,242 @@
+#===================
+#Libraries
+#===================
+
+import hashlib
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from utils.instrument import METRICS, stage
+
+#===================
+#Functions
+#===================
+
+#Bounded least-recently-used cache with an optional time-to-live, safe to share between sessions
+#maxsize: number of entries kept, the least recently used one is evicted first
+#ttl: seconds an entry stays valid after being stored, None keeps it until evicted
+class LRUCache:
+    def __init__(self, maxsize=128, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    #Cached value, or `default` when the key is missing or expired
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get( key )
+            if entry is not None and self.ttl is not None and self.clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end( key )
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = ( self.clock() , value )
+            self._entries.move_to_end( key )
+            while len( self._entries ) > self.maxsize:
+                self._entries.popitem( last=False )
+                self.evictions += 1
+
+    #Cached value, computed and stored on a miss
+    def get_or_compute(self, key, compute):
+        missing = object()
+        value = self.get( key , missing )
+        if value is missing:
+            value = compute()
+            self.put( key , value )
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    #Hit/miss counters and current size
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round( self.hits / lookups , 4 ) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'size': len( self._entries ),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+            }
+
+#Content-addressed cache of rendered text (e.g. map HTML) on local disk, shared by every process
+#Each entry is a file named by the hash of its key; the least recently used files are deleted
+#once the directory grows above max_bytes
+class DiskCache:
+    def __init__(self, directory, max_bytes=256 * 2**20, suffix='.html'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, key):
+        digest = hashlib.sha256( repr( key ).encode() ).hexdigest()
+        return os.path.join( self.directory , digest + self.suffix )
+
+    #Cached text, or `default` when the key was never stored or has been evicted
+    def get(self, key, default=None):
+        path = self.path( key )
+        try:
+            with open( path , encoding='utf-8' ) as file:
+                value = file.read()
+            os.utime( path )
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return default
+        with self._lock:
+            self.hits += 1
+        return value
+
+    #Storing is best effort, a read-only or full disk only costs a recompute
+    def put(self, key, value):
+        path = self.path( key )
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs( self.directory , exist_ok=True )
+            with open( tmp_path , 'w' , encoding='utf-8' ) as file:
+                file.write( value )
+            os.replace( tmp_path , path )
+        except OSError:
+            return
+        self.evict()
+
+    #Cached text, computed and stored on a miss
+    def get_or_compute(self, key, compute):
+        value = self.get( key )
+        if value is None:
+            value = compute()
+            self.put( key , value )
+        return value
+
+    #Deleting the least recently used entries until the directory fits in max_bytes
+    def evict(self):
+        entries = []
+        try:
+            with os.scandir( self.directory ) as listing:
+                for entry in listing:
+                    if entry.name.endswith( self.suffix ):
+                        stat = entry.stat()
+                        entries.append( ( stat.st_mtime_ns , stat.st_size , entry.path ) )
+        except OSError:
+            return
+        total = sum( size for _, size, _ in entries )
+        for _, size, path in sorted( entries ):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove( path )
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self):
+        try:
+            with os.scandir( self.directory ) as listing:
+                for entry in listing:
+                    if entry.name.endswith( self.suffix ):
+                        os.remove( entry.path )
+        except OSError:
+            pass
+
+    #Hit/miss counters and current size on disk
+    def stats(self):
+        entries = []
+        try:
+            with os.scandir( self.directory ) as listing:
+                entries = [ entry.stat().st_size for entry in listing if entry.name.endswith( self.suffix ) ]
+        except OSError:
+            pass
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round( self.hits / lookups , 4 ) if lookups else 0.0,
+                'evictions': self.evictions,
+                'size': len( entries ),
+                'bytes': sum( entries ),
+                'max_bytes': self.max_bytes,
+            }
+
+#Hashable key for a filter state, independent of the order the options were picked in
+#name: which result is cached (e.g. the page), version: dataset version the result was computed on
+def canonical_key(name, version=None, **filters):
+    items = []
+    for col, value in sorted( filters.items() ):
+        if value is None:
+            items.append( ( col , None ) )
+        elif isinstance( value , (list, tuple, set, frozenset) ):
+            items.append( ( col , tuple( sorted( set( value ) ) ) ) )
+        elif isinstance( value , (int, float) ):
+            items.append( ( col , float( value ) ) )
+        else:
+            items.append( ( col , value ) )
+    return ( name , version , tuple( items ) )
+
+#Structures derived from a shared frame (indexes, cubes, ...), one per (frame, builder)
+#Entries are dropped together with their frame, the lock is reentrant so a builder can use other per_frame structures
+_DERIVED = {}
+_DERIVED_LOCK = threading.RLock()
+
+#build(df1) on first use for this frame, the cached result afterwards
+#The frame must be kept alive by the caller, e.g. a frame cached by load_data
+def per_frame(df1, build):
+    key = ( id( df1 ) , build )
+    entry = _DERIVED.get( key )
+    if entry is not None and entry[0]() is df1:
+        return entry[1]
+
+    with _DERIVED_LOCK:
+        entry = _DERIVED.get( key )
+        if entry is not None and entry[0]() is df1:
+            return entry[1]
+        with stage( f"build: {getattr( build , '__qualname__' , build )}" , rows_in=len( df1 ) ):
+            value = build( df1 )
+        _DERIVED[key] = ( weakref.ref( df1 , lambda _ref: _DERIVED.pop( key , None ) ) , value )
+        return value
+
+#Cache of aggregated frames and figures shared by every session of the process
+#Size and TTL can be set with the AGGREGATE_CACHE_SIZE and AGGREGATE_CACHE_TTL environment variables
+AGGREGATES = LRUCache(
+    maxsize=int( os.environ.get( 'AGGREGATE_CACHE_SIZE' , 256 ) ),
+    ttl=float( os.environ['AGGREGATE_CACHE_TTL'] ) if os.environ.get( 'AGGREGATE_CACHE_TTL' ) else 3600.0,
+)
+
+#Rendered map HTML per filter state, kept across restarts
+#Location and size can be set with the MAP_CACHE_DIR and MAP_CACHE_BYTES environment variables
+MAP_HTML = DiskCache(
+    os.environ.get( 'MAP_CACHE_DIR' ) or os.path.join( os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ), '.map_cache' ),
+    max_bytes=int( os.environ.get( 'MAP_CACHE_BYTES' , 256 * 2**20 ) ),
+)
+
+#Hits, misses and sizes of both, exported with the stage metrics and shown in the Performance panel
+METRICS.add_cache( 'aggregates' , AGGREGATES )
+METRICS.add_cache( 'map_html' , MAP_HTML )
@@ -0,0 +1,31 @@
+#===================
+#Libraries
+#===================
+
+import numpy as np
+
+#===================
+#Functions
+#===================
+
+#Compressed sparse rows: row i owns values[offsets[i]:offsets[i + 1]]
+#Used for one-to-many mappings (restaurant -> cuisines, term -> postings, ...) without exploding a frame
+
+#CSR arrays (offsets, values) of a list of integer lists
+def from_lists(lists):
+    lengths = np.fromiter( ( len( values ) for values in lists ) , dtype=np.int64 , count=len( lists ) )
+    offsets = np.zeros( len( lists ) + 1 , dtype=np.int64 )
+    np.cumsum( lengths , out=offsets[1:] )
+    values = np.fromiter( ( value for values in lists for value in values ) , dtype=np.int64 , count=offsets[-1] )
+    return offsets , values
+
+#Gathering the CSR rows `rows` as one flat array, with the position of the row each value came from
+def gather(offsets, values, rows):
+    lengths = offsets[rows + 1] - offsets[rows]
+    owners = np.repeat( np.arange( len( rows ) ) , lengths )
+    starts = np.repeat( offsets[rows] - np.cumsum( lengths ) + lengths , lengths )
+    return values[starts + np.arange( len( owners ) )] , owners
+
+#Row of each value, i.e. the inverse of the offsets
+def owners(offsets):
+    return np.repeat( np.arange( len( offsets ) - 1 ) , np.diff( offsets ) )
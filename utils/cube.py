@@ -0,0 +1,382 @@
+#===================
+#Libraries
+#===================
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.aggregates import group_aggregate
+from utils.cache import canonical_key, per_frame
+from utils.cuisines import cuisine_map
+from utils.loader import load_data
+from utils.instrument import instrumented
+
+#===================
+#Functions
+#===================
+
+#Cell grain of the cube, the rating bucket matches the 0.25 steps of the rating slider
+#A restaurant has one entry per cuisine it lists, so it lands in one cell per cuisine
+DIMENSIONS = ['country', 'city', 'cuisines', 'rating_bucket']
+BUCKET_WIDTH = 0.25
+
+#Additive measures kept per cell, summed from the restaurant rows, with the dtype of their sums
+MEASURES = {
+    'votes': np.int64,
+    'average_cost_for_two': np.int64,
+    'aggregate_rating': np.float64,
+}
+
+#Additive columns of each cell, the counts then the MEASURES sums over all entries and over primary entries
+ADDITIVE = { 'count': np.int64 , 'primary': np.int64 , **MEASURES , **{ 'primary_' + col: dtype for col, dtype in MEASURES.items() } }
+
+#HyperLogLog precision, 2**10 one-byte registers per sketched cell (about 3% error)
+HLL_PRECISION = 10
+
+#Dimension value of rows whose country (or city) is missing, e.g. a country code absent from COUNTRIES
+#Those rows stay in the cube under this member, and it is not counted by (dimension, 'nunique')
+UNKNOWN = 'Unknown'
+
+#64-bit mix of the restaurant ids (splitmix64 finalizer)
+def _hash64(values):
+    z = values.astype( np.uint64 ) + np.uint64( 0x9E3779B97F4A7C15 )
+    z = ( z ^ ( z >> np.uint64( 30 ) ) ) * np.uint64( 0xBF58476D1CE4E5B9 )
+    z = ( z ^ ( z >> np.uint64( 27 ) ) ) * np.uint64( 0x94D049BB133111EB )
+    return z ^ ( z >> np.uint64( 31 ) )
+
+#Register index and rank (position of the first set bit) of each hashed id
+def _hll_observations(ids, precision):
+    with np.errstate( over='ignore' ):
+        hashed = _hash64( ids )
+    width = 64 - precision
+    register = ( hashed >> np.uint64( width ) ).astype( np.int64 )
+    rest = hashed & np.uint64( ( 1 << width ) - 1 )
+    bit_length = np.zeros( len( rest ) , dtype=np.int64 )
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = rest >= np.uint64( 1 << shift )
+        bit_length += shift * high
+        rest = np.where( high , rest >> np.uint64( shift ) , rest )
+    bit_length += ( rest > 0 )
+    return register, ( width - bit_length + 1 ).astype( np.uint8 )
+
+#Distinct count estimated from HyperLogLog registers, one row of registers per estimate
+def hll_estimate(registers):
+    registers = np.atleast_2d( registers )
+    m = registers.shape[1]
+    alpha = 0.7213 / ( 1 + 1.079 / m )
+    estimate = alpha * m * m / np.sum( np.exp2( -registers.astype( np.float64 ) ) , axis=1 )
+    zeros = np.sum( registers == 0 , axis=1 )
+    with np.errstate( divide='ignore' ):
+        linear = m * np.log( m / np.maximum( zeros , 1 ) )
+    estimate = np.where( ( estimate <= 2.5 * m ) & ( zeros > 0 ) , linear , estimate )
+    return np.rint( estimate ).astype( np.int64 )
+
+#Pre-aggregated restaurant stats at the (country, city, cuisine, rating bucket) grain
+#Each cell holds two sets of counts and MEASURES sums, plus the distinct restaurant ids:
+#  - count/<measure>: every restaurant listing the cell's cuisine, used per cuisine
+#  - primary/primary_<measure>: only the restaurants whose first cuisine it is, so summing
+#    cells without a cuisine filter counts each restaurant once
+#Restaurant ids are kept exactly per cell, as (cell, id) pairs, until they would take more memory
+#than HyperLogLog registers; such a cell gets a row of registers instead, so registers are only
+#allocated for the few large cells
+#Distinct restaurant counts are exact while every restaurant id was seen only once, or when no
+#sketched cell is involved, and fall back to the HyperLogLog estimate otherwise
+#New rows are merged with add(), existing cells are updated in place of a rebuild; restaurant_cube
+#extends the previous cube this way when a new dataset version only appends rows
+class RestaurantCube:
+    def __init__(self, bucket_width=BUCKET_WIDTH, precision=HLL_PRECISION):
+        self.bucket_width = bucket_width
+        self.precision = precision
+        self.cells = pd.DataFrame( { **{ dim: pd.Series( dtype=object ) for dim in DIMENSIONS[:-1] },
+                                     'rating_bucket': pd.Series( dtype=np.int16 ),
+                                     **{ col: pd.Series( dtype=dtype ) for col, dtype in ADDITIVE.items() } } )
+        self.pair_cells = np.zeros( 0 , dtype=np.int64 )
+        self.pair_ids = np.zeros( 0 , dtype=np.int64 )
+        self.sketch_row = np.zeros( 0 , dtype=np.int64 )
+        self.registers = np.zeros( ( 0 , 1 << precision ) , dtype=np.uint8 )
+        #A cell moves to registers once its exact ids (8 bytes each) outgrow them
+        self.exact_limit = ( 1 << precision ) // 8
+        self.ids_unique = True
+        self._seen_ids = np.zeros( 0 , dtype=np.int64 )
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df1, **kwargs):
+        cube = cls( **kwargs )
+        cube.add( df1 )
+        return cube
+
+    #Independent cube with the same cells, which can be extended without changing this one
+    def copy(self):
+        cube = type( self )( self.bucket_width , self.precision )
+        with self._lock:
+            cube.cells = self.cells.copy()
+            cube.pair_cells, cube.pair_ids = self.pair_cells.copy() , self.pair_ids.copy()
+            cube.sketch_row, cube.registers = self.sketch_row.copy() , self.registers.copy()
+            cube.ids_unique, cube._seen_ids = self.ids_unique , self._seen_ids.copy()
+        return cube
+
+    #Rating bucket of each rating, bucket b holds ratings in [b * width, (b + 1) * width)
+    def bucket(self, ratings):
+        return np.floor( np.asarray( ratings , dtype=np.float64 ) / self.bucket_width ).astype( np.int16 )
+
+    #Merging a batch of cleaned rows into the cube, one entry per (restaurant, listed cuisine)
+    def add(self, df1):
+        mapping = cuisine_map( df1 )
+        rows = mapping.owners
+        keys = pd.DataFrame( { 'country': df1['country'].astype( object ).to_numpy()[rows],
+                               'city': df1['city'].astype( object ).to_numpy()[rows],
+                               'cuisines': mapping.categories.to_numpy( dtype=object )[mapping.values],
+                               'rating_bucket': self.bucket( df1['aggregate_rating'] )[rows],
+                               'primary': mapping.primary.astype( np.int64 ) } )
+        for col in MEASURES:
+            keys[col] = df1[col].to_numpy( dtype=MEASURES[col] )[rows]
+            keys['primary_' + col] = np.where( mapping.primary , keys[col] , 0 ).astype( MEASURES[col] )
+        keys['restaurant_id'] = df1['restaurant_id'].to_numpy()[rows]
+        keys[DIMENSIONS[:-1]] = keys[DIMENSIONS[:-1]].fillna( UNKNOWN )
+        ids = keys['restaurant_id'].to_numpy( dtype=np.int64 )
+
+        batch = group_aggregate( keys , DIMENSIONS , { 'count': ( 'votes' , 'count' ) , **{ col: ( col , 'sum' ) for col in list( ADDITIVE )[1:] } } )
+        codes = batch.index.get_indexer( pd.MultiIndex.from_frame( keys[DIMENSIONS] ) )
+
+        with self._lock:
+            self._track_ids( df1['restaurant_id'].to_numpy() )
+            positions = self._merge( batch.reset_index() )
+            self._add_ids( positions[codes] , ids )
+
+    #Keeping the set of seen ids only while they are all distinct
+    def _track_ids(self, ids):
+        if not self.ids_unique:
+            return
+        batch_ids = pd.unique( ids )
+        if len( batch_ids ) < len( ids ) or np.isin( batch_ids , self._seen_ids ).any():
+            self.ids_unique = False
+            self._seen_ids = np.zeros( 0 , dtype=np.int64 )
+            return
+        self._seen_ids = np.union1d( self._seen_ids , batch_ids.astype( np.int64 ) )
+
+    #Adding a batch of cells, new cells are appended and existing ones are summed in place
+    #Returns the position of each batch cell in the cube
+    def _merge(self, batch):
+        current = pd.MultiIndex.from_frame( self.cells[DIMENSIONS] )
+        positions = current.get_indexer( pd.MultiIndex.from_frame( batch[DIMENSIONS] ) )
+        new = positions < 0
+        positions[new] = len( self.cells ) + np.arange( new.sum() )
+
+        cells = pd.concat( [ self.cells , batch.loc[new, self.cells.columns] ] , ignore_index=True )
+        existing = positions[~new]
+        for col in ADDITIVE:
+            values = cells[col].to_numpy( copy=True )
+            values[existing] += batch.loc[~new, col].to_numpy()
+            cells[col] = values
+
+        self.cells = cells
+        self.sketch_row = np.concatenate( [ self.sketch_row , np.full( new.sum() , -1 , dtype=np.int64 ) ] )
+        return positions
+
+    #Recording restaurant `ids` in the cells at `cells`, exactly or in the registers of sketched cells
+    def _add_ids(self, cells, ids):
+        sketched = self.sketch_row[cells] >= 0
+        self._observe( self.sketch_row[cells[sketched]] , ids[sketched] )
+
+        pairs = pd.DataFrame( { 'cell': np.concatenate( [ self.pair_cells , cells[~sketched] ] ),
+                                'id': np.concatenate( [ self.pair_ids , ids[~sketched] ] ) } )
+        pairs = pairs.drop_duplicates().sort_values( ['cell', 'id'] )
+        pair_cells, pair_ids = pairs['cell'].to_numpy() , pairs['id'].to_numpy()
+
+        promoted = np.bincount( pair_cells , minlength=len( self.cells ) ) > self.exact_limit
+        if promoted.any():
+            rows = np.flatnonzero( promoted )
+            self.sketch_row[rows] = len( self.registers ) + np.arange( len( rows ) )
+            self.registers = np.concatenate( [ self.registers , np.zeros( ( len( rows ) , self.registers.shape[1] ) , dtype=np.uint8 ) ] )
+            moving = promoted[pair_cells]
+            self._observe( self.sketch_row[pair_cells[moving]] , pair_ids[moving] )
+            pair_cells, pair_ids = pair_cells[~moving] , pair_ids[~moving]
+        self.pair_cells, self.pair_ids = pair_cells , pair_ids
+
+    #Folding restaurant `ids` into the register rows `rows`
+    def _observe(self, rows, ids):
+        if len( ids ) == 0:
+            return
+        m = self.registers.shape[1]
+        register, rank = _hll_observations( ids , self.precision )
+        slots = pd.Series( rank ).groupby( rows * m + register ).max()
+        flat = self.registers.reshape( -1 )
+        index = slots.index.to_numpy()
+        flat[index] = np.maximum( flat[index] , slots.to_numpy() )
+
+    #Cells matching the filters, same semantics as FilterIndex.select
+    #rating_below has to sit on the bucket grid (a multiple of bucket_width)
+    def select(self, rating_below=None, **selections):
+        cells = self.cells
+        mask = np.ones( len( cells ) , dtype=bool )
+        if rating_below is not None:
+            limit = rating_below / self.bucket_width
+            if abs( limit - round( limit ) ) > 1e-9:
+                raise ValueError( f'rating_below={rating_below} is not a multiple of the cube bucket width {self.bucket_width}' )
+            mask &= cells['rating_bucket'].to_numpy() < round( limit )
+        for col, values in selections.items():
+            if values is not None:
+                mask &= cells[col].isin( list( values ) ).to_numpy()
+        return np.flatnonzero( mask )
+
+    #Aggregates over the selected cells, with the same metrics spec as group_aggregate
+    #Supported: (col, 'sum' | 'mean') for the measures, ('*', 'count') for rows,
+    #(dimension, 'nunique') and ('restaurant_id', 'nunique')
+    #key=None returns the totals as a Series
+    #Grouped or filtered by cuisine, a restaurant counts in each cuisine it lists (and once per
+    #selected cuisine it lists); otherwise each restaurant counts once
+    @instrumented( 'aggregate' )
+    def aggregate(self, key, metrics, rating_below=None, **selections):
+        positions = self.select( rating_below , **selections )
+        return self._aggregate_cells( positions , key , metrics , selections.get( 'cuisines' ) is not None )
+
+    #Several aggregates in one pass, a list of (key, metrics, rating_below, selections) in and their results out
+    #Requests with the same filters share one cell selection, and those also grouped by the same key
+    #share one grouping with their metrics merged (unless two metrics of the same name differ)
+    @instrumented( 'aggregate' )
+    def aggregate_batch(self, requests):
+        results = [None] * len( requests )
+        by_filters = {}
+        for i, ( key, metrics, rating_below, selections ) in enumerate( requests ):
+            by_filters.setdefault( canonical_key( 'cells' , None , rating_below=rating_below , **selections ) , [] ).append( i )
+
+        for indices in by_filters.values():
+            _, _, rating_below, selections = requests[indices[0]]
+            positions = self.select( rating_below , **selections )
+            by_key = {}
+            for i in indices:
+                key = requests[i][0]
+                by_key.setdefault( tuple( key ) if isinstance( key , list ) else key , [] ).append( i )
+            for same_key in by_key.values():
+                merged = []
+                for i in same_key:
+                    metrics = requests[i][1]
+                    for spec, members in merged:
+                        if all( spec.get( name , value ) == value for name, value in metrics.items() ):
+                            spec.update( metrics )
+                            members.append( i )
+                            break
+                    else:
+                        merged.append( ( dict( metrics ) , [i] ) )
+                for spec, members in merged:
+                    result = self._aggregate_cells( positions , requests[members[0]][0] , spec , selections.get( 'cuisines' ) is not None )
+                    for i in members:
+                        results[i] = result[list( requests[i][1] )] if requests[i][0] is None else result.loc[:, list( requests[i][1] )]
+        return results
+
+    #Aggregates over the cells at `positions`, cuisine_filter tells whether the cells were selected by cuisine
+    def _aggregate_cells(self, positions, key, metrics, cuisine_filter=False):
+        cells = self.cells.iloc[positions].reset_index( drop=True )
+        group = key if key is not None else '_total'
+        if key is None:
+            cells['_total'] = 0
+        grouped_by_cuisine = 'cuisines' in ( key if isinstance( key , (list, tuple) ) else [key] )
+        prefix = '' if grouped_by_cuisine or cuisine_filter else 'primary_'
+
+        spec = { '_count': ( 'count' if prefix == '' else 'primary' , 'sum' ) }
+        for name, (col, func) in metrics.items():
+            if func in ('sum', 'mean'):
+                if col not in MEASURES:
+                    raise ValueError( f'{col!r} is not a cube measure' )
+                spec['_sum_' + col] = ( prefix + col , 'sum' )
+            elif func == 'nunique' and col in DIMENSIONS[:-1]:
+                cells['_known_' + col] = cells[col].mask( cells[col] == UNKNOWN )
+                spec[name] = ( '_known_' + col , 'nunique' )
+            elif not ( func == 'count' or ( func == 'nunique' and col == 'restaurant_id' ) ):
+                raise ValueError( f'Unsupported cube aggregate {func!r} for column {col!r}' )
+        grouped = group_aggregate( cells , group , spec )
+
+        result = pd.DataFrame( index=grouped.index )
+        for name, (col, func) in metrics.items():
+            if func == 'count':
+                result[name] = grouped['_count']
+            elif func == 'sum':
+                result[name] = grouped['_sum_' + col]
+            elif func == 'mean':
+                result[name] = grouped['_sum_' + col] / grouped['_count']
+            elif col == 'restaurant_id':
+                exact = self.ids_unique and ( grouped_by_cuisine or prefix == 'primary_' )
+                result[name] = grouped['_count'] if exact else self._distinct_restaurants( positions , cells , group , grouped.index )
+            else:
+                result[name] = grouped[name]
+
+        if key is None:
+            return pd.Series( { name: result[name].iloc[0] if len( result ) else 0 for name in result.columns } , dtype=object )
+        return result
+
+    #Distinct restaurants per group of cells: exact from the (cell, id) pairs for the groups without
+    #sketched cells, HyperLogLog estimate of the merged registers and exact ids for the others
+    def _distinct_restaurants(self, positions, cells, group, index):
+        if isinstance( group , (list, tuple) ):
+            codes = index.get_indexer( pd.MultiIndex.from_frame( cells[list( group )] ) )
+        else:
+            codes = index.get_indexer( cells[group] )
+        counts = np.zeros( len( index ) , dtype=np.int64 )
+        if len( codes ) == 0:
+            return counts
+
+        group_of_cell = np.full( len( self.cells ) , -1 , dtype=np.int64 )
+        group_of_cell[positions] = codes
+        pair_groups = group_of_cell[self.pair_cells]
+        selected = pair_groups >= 0
+        pairs = pd.DataFrame( { 'group': pair_groups[selected] , 'id': self.pair_ids[selected] } ).drop_duplicates()
+        counts += np.bincount( pairs['group'].to_numpy() , minlength=len( index ) )
+
+        rows = self.sketch_row[positions]
+        sketched = rows >= 0
+        if sketched.any():
+            sketched_codes = codes[sketched]
+            order = np.argsort( sketched_codes , kind='stable' )
+            groups, starts = np.unique( sketched_codes[order] , return_index=True )
+            merged = np.maximum.reduceat( self.registers[rows[sketched][order]] , starts , axis=0 )
+            #Exact ids of the other cells in those groups go into the merged registers
+            slot = np.full( len( index ) , -1 , dtype=np.int64 )
+            slot[groups] = np.arange( len( groups ) )
+            joining = slot[pairs['group'].to_numpy()]
+            register, rank = _hll_observations( pairs['id'].to_numpy()[joining >= 0] , self.precision )
+            np.maximum.at( merged , ( joining[joining >= 0] , register ) , rank )
+            counts[groups] = hll_estimate( merged )
+        return counts
+
+#Columns of a frame the cube is built from
+CUBE_COLUMNS = ['restaurant_id', 'country', 'city', 'cuisine_list', *MEASURES]
+
+#Latest cube built by restaurant_cube, with the number of rows it holds and their digest
+_LATEST = {}
+_LATEST_LOCK = threading.Lock()
+
+#Order-independent digest of the cube columns of each prefix length asked for, from one hash per row
+def _row_digests(df1, *lengths):
+    hashes = pd.util.hash_pandas_object( df1[CUBE_COLUMNS] , index=False ).to_numpy()
+    return [ int( hashes[:n].sum() ) for n in lengths ]
+
+#Cube of a new dataset version: when its first rows are those of the latest cube (the csv or the store
+#only gained rows), that cube is copied and the new rows merged with add(), otherwise it is built from scratch
+def extended_cube(df1):
+    with _LATEST_LOCK:
+        latest = dict( _LATEST )
+    previous = latest.get( 'rows' , 0 )
+    if 0 < previous <= len( df1 ):
+        prefix, digest = _row_digests( df1 , previous , len( df1 ) )
+        if prefix == latest['digest']:
+            cube = latest['cube'].copy()
+            cube.add( df1.iloc[previous:] )
+        else:
+            cube = RestaurantCube.from_frame( df1 )
+    else:
+        cube = RestaurantCube.from_frame( df1 )
+        digest, = _row_digests( df1 , len( df1 ) )
+    with _LATEST_LOCK:
+        _LATEST.update( cube=cube , rows=len( df1 ) , digest=digest )
+    return cube
+
+#Cube of a full frame returned by load_data, built on first use and shared
+def restaurant_cube(df1):
+    return per_frame( df1 , extended_cube )
+
+#Cube of the full cleaned dataset, shared by every page
+def load_cube():
+    return restaurant_cube( load_data() )
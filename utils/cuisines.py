@@ -0,0 +1,87 @@
+#===================
+#Libraries
+#===================
+
+import numpy as np
+import pandas as pd
+
+from utils.aggregates import aggregate_codes
+from utils.cache import per_frame
+from utils.csr import gather, owners
+from utils.loader import source_frame
+
+#===================
+#Functions
+#===================
+
+#Distinct cuisines of each comma-separated list, in listed order, as CSR arrays
+#Returns (offsets, values, categories): row i lists categories[values[offsets[i]:offsets[i + 1]]],
+#its first cuisine being the primary one. Every distinct string is split once, all of them
+#exploded together and resolved to codes in a single get_indexer call
+def split_cuisines(series):
+    codes, uniques = pd.factorize( series.astype( str ) )
+    parts = pd.Series( uniques , dtype=object ).str.split( ',' ).explode()
+    entries = pd.DataFrame( { 'list': parts.index.to_numpy( dtype=np.int64 ) , 'name': parts.str.strip().to_numpy( dtype=object ) } )
+    #Blank names and repeats within a list are dropped, the first occurrence keeps its position
+    entries = entries.loc[entries['name'].to_numpy() != ''].drop_duplicates()
+    categories = pd.Index( np.sort( entries['name'].unique() ) , name='cuisines' )
+    values = categories.get_indexer( entries['name'] )
+    offsets = np.zeros( len( uniques ) + 1 , dtype=np.int64 )
+    np.cumsum( np.bincount( entries['list'].to_numpy() , minlength=len( uniques ) ) , out=offsets[1:] )
+    valid = np.flatnonzero( codes >= 0 )
+    row_values, row_owners = gather( offsets , values , codes[valid] )
+    row_lengths = np.zeros( len( series ) , dtype=np.int64 )
+    row_lengths[valid] = offsets[codes[valid] + 1] - offsets[codes[valid]]
+    row_offsets = np.zeros( len( series ) + 1 , dtype=np.int64 )
+    np.cumsum( row_lengths , out=row_offsets[1:] )
+    return row_offsets , row_values.astype( np.int32 ) , categories
+
+#Restaurant -> cuisines mapping of a frame, stored as CSR arrays instead of an exploded frame
+#  - offsets/values: the cuisine codes of each row, primary cuisine first
+#  - owners: the row of each (restaurant, cuisine) entry, primary: whether the entry is its row's first
+#  - by_cuisine/bounds: the entries sorted by cuisine, so the rows of one cuisine are a slice
+#Frames without the full list (column) fall back to the single 'cuisines' column
+class CuisineMap:
+    def __init__(self, df1, column='cuisine_list'):
+        source = df1[column] if column in df1.columns else df1['cuisines']
+        self.n_rows = len( df1 )
+        self.offsets, self.values, self.categories = split_cuisines( source )
+        self.owners = owners( self.offsets )
+        self.primary = np.zeros( len( self.values ) , dtype=bool )
+        self.primary[self.offsets[:-1][np.diff( self.offsets ) > 0]] = True
+        self.by_cuisine = np.argsort( self.values , kind='stable' )
+        self.bounds = np.searchsorted( self.values[self.by_cuisine] , np.arange( len( self.categories ) + 1 ) )
+
+    #Number of cuisines listed by each row
+    def lengths(self):
+        return np.diff( self.offsets )
+
+    #Row positions listing a cuisine, in frame order
+    def rows_of(self, cuisine):
+        code = self.categories.get_indexer( [cuisine] )[0]
+        if code < 0:
+            return np.zeros( 0 , dtype=np.int64 )
+        return self.owners[self.by_cuisine[self.bounds[code]:self.bounds[code + 1]]]
+
+    #Boolean row mask of the rows listing any of the cuisines
+    def any_of(self, cuisines):
+        mask = np.zeros( self.n_rows , dtype=bool )
+        for cuisine in set( cuisines ):
+            mask[self.rows_of( cuisine )] = True
+        return mask
+
+    #Aggregates per cuisine, every restaurant counting once in each cuisine it lists
+    #Same metrics spec as group_aggregate, the values are gathered through the mapping,
+    #mask restricts the rows (all rows when None), cuisines without rows are dropped
+    def aggregate(self, df1, metrics, mask=None):
+        entries = np.arange( len( self.values ) ) if mask is None else np.flatnonzero( mask[self.owners] )
+        rows = self.owners[entries]
+        result = aggregate_codes( self.values[entries] , self.categories , lambda col: df1[col].to_numpy()[rows] , metrics )
+        return result[np.bincount( self.values[entries] , minlength=len( self.categories ) ) > 0]
+
+#Cuisine mapping of a frame returned by load_data, built once per dataset version and shared:
+#projections holding the full lists use the mapping of the full frame they were cut from
+def cuisine_map(df1):
+    if 'cuisine_list' in df1.columns:
+        df1 = source_frame( df1 )
+    return per_frame( df1 , CuisineMap )
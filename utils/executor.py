@@ -0,0 +1,155 @@
+#===================
+#Libraries
+#===================
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from utils.cache import AGGREGATES, canonical_key
+from utils.instrument import attached, current_run, stage
+
+#===================
+#Functions
+#===================
+
+#Query executor shared by every session of the process
+#  - single-flight: a request identical to one still running waits for that one instead of running again
+#  - batching: cube aggregates waiting for a worker are answered together by RestaurantCube.aggregate_batch,
+#    so the requests that pile up while the workers are busy cost one pass over the cells
+#  - admission control: at most max_workers queries run at a time, the others wait in the queue
+#Work submitted from a worker runs inline, a worker never waits on the queue it is draining
+#Pool size can be set with the QUERY_WORKERS environment variable
+QUERY_WORKERS = int( os.environ.get( 'QUERY_WORKERS' , 4 ) )
+
+class QueryExecutor:
+    def __init__(self, max_workers=QUERY_WORKERS):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor( max_workers=max_workers , thread_name_prefix='query' , initializer=self._mark_worker )
+        self._in_flight = {}
+        self._pending = []
+        self._lock = threading.Lock()
+        self._worker = threading.local()
+        self.submitted = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.batched = 0
+
+    def _mark_worker(self):
+        self._worker.active = True
+
+    def in_worker(self):
+        return getattr( self._worker , 'active' , False )
+
+    #Future of fn(*args, **kwargs), shared with the identical request (same key) still in flight
+    def submit(self, key, fn, *args, **kwargs):
+        with self._lock:
+            self.submitted += 1
+            future = self._in_flight.get( key )
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = self._in_flight[key] = Future()
+        #The stages of the computation are recorded in the run of the session that started it
+        self._pool.submit( self._call , key , future , current_run() , fn , args , kwargs )
+        return future
+
+    def _call(self, key, future, run, fn, args, kwargs):
+        try:
+            with attached( run ):
+                self._settle( [future] , lambda: [fn( *args , **kwargs )] )
+        finally:
+            with self._lock:
+                self._in_flight.pop( key , None )
+
+    #fn(*args, **kwargs) through the pool, waiting for its result
+    def run(self, key, fn, *args, **kwargs):
+        if self.in_worker():
+            return fn( *args , **kwargs )
+        with stage( f'query: {key[0] if isinstance( key , tuple ) else key}' ):
+            return self.submit( key , fn , *args , **kwargs ).result()
+
+    #Future of cube.aggregate(key, metrics, rating_below, **selections), batched with the aggregates queued with it
+    def submit_aggregate(self, cube, key, metrics, rating_below=None, **selections):
+        request_key = canonical_key( ( 'aggregate' , id( cube ) , tuple( key ) if isinstance( key , list ) else key , tuple( sorted( metrics.items() ) ) ) ,
+                                     None , rating_below=rating_below , **selections )
+        with self._lock:
+            self.submitted += 1
+            future = self._in_flight.get( request_key )
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = self._in_flight[request_key] = Future()
+            self._pending.append( ( request_key , future , cube , ( key , metrics , rating_below , selections ) ) )
+            #One flush is queued per batch, requests arriving before it starts join the batch
+            schedule = len( self._pending ) == 1
+        if schedule:
+            self._pool.submit( self._flush , current_run() )
+        return future
+
+    def _flush(self, run):
+        with self._lock:
+            pending, self._pending = self._pending , []
+        try:
+            by_cube = {}
+            for entry in pending:
+                by_cube.setdefault( id( entry[2] ) , [] ).append( entry )
+            with attached( run ):
+                for entries in by_cube.values():
+                    with self._lock:
+                        self.batches += 1
+                        self.batched += len( entries )
+                    cube = entries[0][2]
+                    self._settle( [ future for _, future, _, _ in entries ] , lambda: cube.aggregate_batch( [ request for _, _, _, request in entries ] ) )
+        finally:
+            with self._lock:
+                for request_key, _, _, _ in pending:
+                    self._in_flight.pop( request_key , None )
+
+    #Cube aggregate through the pool, waiting for its result
+    def aggregate(self, cube, key, metrics, rating_below=None, **selections):
+        if self.in_worker():
+            return cube.aggregate( key , metrics , rating_below=rating_below , **selections )
+        with stage( 'query: aggregate' ):
+            return self.submit_aggregate( cube , key , metrics , rating_below , **selections ).result()
+
+    #Setting the futures to the results of compute(), or all of them to its exception
+    @staticmethod
+    def _settle(futures, compute):
+        try:
+            results = compute()
+        except BaseException as error:
+            for future in futures:
+                future.set_exception( error )
+        else:
+            for future, result in zip( futures , results ):
+                future.set_result( result )
+
+    #Submitted, coalesced and batched request counters
+    def stats(self):
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'coalesced': self.coalesced,
+                'batches': self.batches,
+                'batched': self.batched,
+                'in_flight': len( self._in_flight ),
+                'max_workers': self.max_workers,
+            }
+
+EXECUTOR = QueryExecutor()
+
+#Cached result of compute() in `cache`, computed once through EXECUTOR however many sessions ask for it at once
+#The result is stored before the in-flight request is released, so later requests find it in the cache
+def shared_result(key, compute, cache=AGGREGATES):
+    missing = object()
+    value = cache.get( key , missing )
+    if value is not missing:
+        return value
+    def compute_and_store():
+        value = cache.get( key , missing )
+        if value is missing:
+            value = compute()
+            cache.put( key , value )
+        return value
+    return EXECUTOR.run( key , compute_and_store )
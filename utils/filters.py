@@ -0,0 +1,129 @@
+#===================
+#Libraries
+#===================
+
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import AGGREGATES, canonical_key, per_frame
+from utils.cuisines import cuisine_map
+from utils.instrument import instrumented
+from utils.loader import source_frame
+
+#===================
+#Functions
+#===================
+
+#Row bitmaps are stored packed, one bit per row (np.packbits / np.unpackbits)
+def positions_bitmap(positions, n_rows):
+    mask = np.zeros( n_rows , dtype=bool )
+    mask[positions] = True
+    return np.packbits( mask )
+
+#Filters matching any value of a multi-valued column, as {filter: column holding the full list}
+LIST_COLUMNS = {'cuisines': 'cuisine_list'}
+
+#Precomputed indexes over a cleaned frame, used to resolve the sidebar filters
+#  - a sorted rating index, the "rating below" slider becomes one searchsorted call
+#  - one row bitmap per value of each indexed column (country, cuisines, ...)
+#A selection is the AND of the rating bitmap and of the OR of the selected values' bitmaps
+#The cuisines filter matches every cuisine a restaurant lists, through the cuisine mapping
+#The index only keeps a weak reference to its frame, the caller keeps the frame alive
+class FilterIndex:
+    def __init__(self, df1, columns=('country', 'cuisines'), rating_column='aggregate_rating', lists=LIST_COLUMNS):
+        self._frame = weakref.ref( df1 )
+        self.n_rows = len( df1 )
+        self.all_rows = positions_bitmap( np.arange( self.n_rows ) , self.n_rows )
+
+        ratings = df1[rating_column].to_numpy()
+        self.rating_order = np.argsort( ratings , kind='stable' )
+        self.sorted_ratings = ratings[self.rating_order]
+        self._rating_bitmaps = {}
+        self._lock = threading.Lock()
+
+        self.bitmaps = {}
+        self.multi_valued = set()
+        for col in columns:
+            if col in lists and lists[col] in df1.columns:
+                self.bitmaps[col] = self._list_bitmaps( cuisine_map( df1 ) )
+                self.multi_valued.add( col )
+            elif col in df1.columns:
+                self.bitmaps[col] = self._value_bitmaps( df1[col] )
+
+    #One bitmap per distinct value, built from a single sort of the column codes
+    def _value_bitmaps(self, series):
+        codes, uniques = pd.factorize( series )
+        order = np.argsort( codes , kind='stable' )
+        bounds = np.searchsorted( codes[order] , np.arange( len( uniques ) + 1 ) )
+        return { value: positions_bitmap( order[bounds[i]:bounds[i + 1]] , self.n_rows ) for i, value in enumerate( uniques ) }
+
+    #One bitmap per value of a CSR mapping, a row is set in the bitmap of every value it lists
+    def _list_bitmaps(self, mapping):
+        rows = mapping.owners[mapping.by_cuisine]
+        return { value: positions_bitmap( rows[mapping.bounds[i]:mapping.bounds[i + 1]] , self.n_rows ) for i, value in enumerate( mapping.categories ) }
+
+    #Rows with rating strictly below the threshold, cached per slider position
+    def rating_below(self, threshold):
+        k = int( np.searchsorted( self.sorted_ratings , threshold , side='left' ) )
+        bitmap = self._rating_bitmaps.get( k )
+        if bitmap is None:
+            bitmap = positions_bitmap( self.rating_order[:k] , self.n_rows )
+            with self._lock:
+                self._rating_bitmaps[k] = bitmap
+        return bitmap
+
+    #Rows whose `col` is any of `values`
+    #When most values of a single-valued column are selected, the unselected bitmaps are OR-ed and inverted instead
+    def any_of(self, col, values):
+        bitmaps = self.bitmaps[col]
+        selected = set( values )
+        if len( selected ) > len( bitmaps ) / 2 and col not in self.multi_valued:
+            unselected = [ bitmap for value, bitmap in bitmaps.items() if value not in selected ]
+            if not unselected:
+                return self.all_rows
+            return self.all_rows & ~np.bitwise_or.reduce( unselected )
+        chosen = [ bitmaps[value] for value in selected if value in bitmaps ]
+        if not chosen:
+            return np.zeros_like( self.all_rows )
+        return np.bitwise_or.reduce( chosen )
+
+    #Packed row bitmap matching every given filter
+    #A filter left as None is not applied, an empty selection matches no rows
+    def bitmap(self, rating_below=None, **selections):
+        bitmap = self.all_rows
+        if rating_below is not None:
+            bitmap = bitmap & self.rating_below( rating_below )
+        for col, values in selections.items():
+            if values is not None:
+                bitmap = bitmap & self.any_of( col , values )
+        return bitmap
+
+    #Boolean row mask matching every given filter
+    @instrumented( 'filter' )
+    def mask(self, rating_below=None, **selections):
+        return np.unpackbits( self.bitmap( rating_below , **selections ) , count=self.n_rows ).view( bool )
+
+    #Row positions matching every given filter, in frame order
+    def select(self, rating_below=None, **selections):
+        return np.flatnonzero( self.mask( rating_below , **selections ) )
+
+    #Filtered frame the index was built on, same rows as the equivalent chain of boolean masks
+    def filter(self, rating_below=None, **selections):
+        return self._frame().iloc[self.select( rating_below , **selections )]
+
+#Filter index of a frame returned by load_data, built once per dataset version and shared:
+#projections use the index of the full frame they were cut from, whose rows they share
+def filter_index(df1):
+    return per_frame( source_frame( df1 ) , FilterIndex )
+
+#Row mask of the filters, shared by every page and session through AGGREGATES
+#Page frames are column projections of the same cleaned rows, so a selection computed on one page
+#is reused as is by the next one. version: dataset version the index was built on (data_version())
+@instrumented( 'filter' )
+def shared_mask(index, version, rating_below=None, **selections):
+    key = canonical_key( 'rows' , ( version , index.n_rows ) , rating_below=rating_below , **selections )
+    bitmap = AGGREGATES.get_or_compute( key , lambda: index.bitmap( rating_below , **selections ) )
+    return np.unpackbits( bitmap , count=index.n_rows ).view( bool )
@@ -0,0 +1,202 @@
+#===================
+#Libraries
+#===================
+
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import per_frame
+from utils.instrument import instrumented
+
+#===================
+#Functions
+#===================
+
+#Zoom levels with precomputed clusters, from this zoom on the map shows single restaurants
+DETAIL_ZOOM = 12
+
+#Cluster cells per 256px map tile side, about 64px per cell
+CELLS_PER_TILE = 4
+
+#Above this number of restaurants in view the map shows clusters instead of pins
+MAX_MARKERS = 500
+
+#Leaflet bounds ({'_southWest': {'lat', 'lng'}, '_northEast': {...}}) as (south, west, north, east)
+def bounds_box(bounds):
+    if not bounds or not bounds.get( '_southWest' ) or not bounds.get( '_northEast' ):
+        return None
+    south_west, north_east = bounds['_southWest'], bounds['_northEast']
+    box = ( south_west['lat'] , south_west['lng'] , north_east['lat'] , north_east['lng'] )
+    return None if None in box else box
+
+#folium's [[south, west], [north, east]] bounds in the Leaflet format reported by st_folium
+def leaflet_bounds(bounds_list):
+    ( south , west ), ( north , east ) = bounds_list
+    return { '_southWest': { 'lat': south , 'lng': west } , '_northEast': { 'lat': north , 'lng': east } }
+
+#Rows of (lat, lon) inside a (south, west, north, east) box, the box may cross the antimeridian
+def in_box(lat, lon, box):
+    if box is None:
+        return np.ones( len( lat ) , dtype=bool )
+    south, west, north, east = box
+    inside = ( lat >= south ) & ( lat <= north )
+    if east - west >= 360:
+        return inside
+    west, east = ( west + 180 ) % 360 - 180 , ( east + 180 ) % 360 - 180
+    if west <= east:
+        return inside & ( lon >= west ) & ( lon <= east )
+    return inside & ( ( lon >= west ) | ( lon <= east ) )
+
+#Grid clusters of the restaurants, one grid per zoom level below DETAIL_ZOOM
+#Each level stores the cell code of every row, so clustering a filtered selection
+#is a bincount over the selected rows instead of a spatial computation per rerun
+class GridClusters:
+    def __init__(self, df1, max_zoom=DETAIL_ZOOM, cells_per_tile=CELLS_PER_TILE):
+        self.lat = df1['latitude'].to_numpy( dtype=np.float64 )
+        self.lon = df1['longitude'].to_numpy( dtype=np.float64 )
+        self.max_zoom = max_zoom
+        self.levels = []
+        for zoom in range( max_zoom ):
+            size = 360.0 / ( 2 ** zoom * cells_per_tile )
+            ix = np.floor( ( self.lon + 180.0 ) / size ).astype( np.int64 )
+            iy = np.floor( ( self.lat + 90.0 ) / size ).astype( np.int64 )
+            codes, uniques = pd.factorize( ix * ( int( 180.0 / size ) + 2 ) + iy )
+            self.levels.append( ( codes.astype( np.int32 ) , len( uniques ) ) )
+
+    #Positions of the selected rows inside the viewport
+    def in_view(self, mask, box=None):
+        return np.flatnonzero( mask & in_box( self.lat , self.lon , box ) )
+
+    #Cluster centroids and sizes of the selected rows at a zoom level, limited to the viewport
+    def clusters(self, zoom, mask, box=None):
+        codes, n_cells = self.levels[min( max( int( zoom ) , 0 ) , self.max_zoom - 1 )]
+        positions = np.flatnonzero( mask )
+        selected = codes[positions]
+        counts = np.bincount( selected , minlength=n_cells )
+        with np.errstate( invalid='ignore' , divide='ignore' ):
+            lat = np.bincount( selected , weights=self.lat[positions] , minlength=n_cells ) / counts
+            lon = np.bincount( selected , weights=self.lon[positions] , minlength=n_cells ) / counts
+        used = counts > 0
+        clusters = pd.DataFrame( { 'latitude': lat[used] , 'longitude': lon[used] , 'count': counts[used] } )
+        return clusters[in_box( clusters['latitude'].to_numpy() , clusters['longitude'].to_numpy() , box )].reset_index( drop=True )
+
+#Grid clusters of a frame returned by load_data, built on first use and shared
+def grid_clusters(df1):
+    return per_frame( df1 , GridClusters )
+
+#=================================================== Spatial Index =======================================================
+
+EARTH_RADIUS_KM = 6371.0088
+
+#Size in degrees of the spatial index buckets, about 55 km of latitude
+BUCKET_DEGREES = 0.5
+
+#Great-circle distance in km between one point and arrays of points
+def haversine_km(lat, lon, lats, lons):
+    lat, lon, lats, lons = map( np.radians , ( lat , lon , lats , lons ) )
+    a = np.sin( ( lats - lat ) / 2 ) ** 2 + np.cos( lat ) * np.cos( lats ) * np.sin( ( lons - lon ) / 2 ) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin( np.sqrt( np.clip( a , 0 , 1 ) ) )
+
+#Restaurants bucketed on a lat/lon grid, stored CSR-style: rows sorted by bucket plus bucket offsets
+#A radius query only computes distances for the rows of the buckets the circle touches,
+#nearest() grows the radius until it holds k restaurants that pass the filters
+class SpatialIndex:
+    def __init__(self, df1, bucket_degrees=BUCKET_DEGREES):
+        self._frame = weakref.ref( df1 )
+        self.lat = df1['latitude'].to_numpy( dtype=np.float64 )
+        self.lon = df1['longitude'].to_numpy( dtype=np.float64 )
+        self.size = bucket_degrees
+        self.n_x = int( np.ceil( 360.0 / bucket_degrees ) )
+        self.n_y = int( np.ceil( 180.0 / bucket_degrees ) ) + 1
+        buckets = self._bucket( self.lat , self.lon )
+        self.order = np.argsort( buckets , kind='stable' )
+        self.offsets = np.searchsorted( buckets[self.order] , np.arange( self.n_x * self.n_y + 1 ) )
+
+    def _bucket(self, lat, lon):
+        ix = np.floor( ( ( np.asarray( lon ) + 180.0 ) % 360.0 ) / self.size ).astype( np.int64 ) % self.n_x
+        iy = np.clip( np.floor( ( np.asarray( lat ) + 90.0 ) / self.size ).astype( np.int64 ) , 0 , self.n_y - 1 )
+        return iy * self.n_x + ix
+
+    #Rows of the buckets overlapping a circle, a superset of the rows inside it
+    def _candidates(self, lat, lon, radius_km):
+        dlat = np.degrees( radius_km / EARTH_RADIUS_KM )
+        south, north = max( lat - dlat , -90.0 ) , min( lat + dlat , 90.0 )
+        widest = max( abs( south ) , abs( north ) )
+        if widest >= 89.0 or dlat >= 90.0:
+            dlon = 180.0
+        else:
+            dlon = min( dlat / np.cos( np.radians( widest ) ) , 180.0 )
+        iy = np.arange( int( np.floor( ( south + 90.0 ) / self.size ) ) , int( np.floor( ( north + 90.0 ) / self.size ) ) + 1 )
+        iy = iy[( iy >= 0 ) & ( iy < self.n_y )]
+        if dlon >= 180.0:
+            ix = np.arange( self.n_x )
+        else:
+            first = int( np.floor( ( lon - dlon + 180.0 ) / self.size ) )
+            last = int( np.floor( ( lon + dlon + 180.0 ) / self.size ) )
+            ix = np.unique( np.arange( first , last + 1 ) % self.n_x )
+        if len( iy ) * len( ix ) >= len( self.order ):
+            return np.arange( len( self.order ) )
+        buckets = ( iy[:, None] * self.n_x + ix[None, :] ).ravel()
+        starts, ends = self.offsets[buckets] , self.offsets[buckets + 1]
+        if not len( buckets ) or ( ends - starts ).sum() == 0:
+            return np.zeros( 0 , dtype=np.int64 )
+        return np.concatenate( [ self.order[s:e] for s, e in zip( starts , ends ) if e > s ] )
+
+    #Positions and distances of the rows within radius_km of a point, nearest first
+    def _within(self, lat, lon, radius_km, mask=None):
+        candidates = self._candidates( lat , lon , radius_km )
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        distances = haversine_km( lat , lon , self.lat[candidates] , self.lon[candidates] )
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside] , distances[inside]
+        order = np.lexsort( ( candidates , distances ) )
+        return candidates[order] , distances[order]
+
+    def _result(self, positions, distances):
+        df_aux = self._frame().iloc[positions].copy()
+        df_aux['distance_km'] = distances.round( 3 )
+        return df_aux
+
+    #Restaurants within radius_km of (lat, lon), nearest first
+    #mask: boolean row mask of the current filters (FilterIndex.mask), None keeps every row
+    @instrumented( 'search' )
+    def within(self, lat, lon, radius_km, mask=None):
+        return self._result( *self._within( lat , lon , radius_km , mask ) )
+
+    #The k restaurants nearest to (lat, lon) that pass the filters, nearest first
+    @instrumented( 'search' )
+    def nearest(self, lat, lon, k, mask=None, start_km=5.0):
+        available = len( self.order ) if mask is None else int( mask.sum() )
+        k = min( k , available )
+        radius = start_km
+        positions, distances = self._within( lat , lon , radius , mask )
+        while len( positions ) < k and radius < np.pi * EARTH_RADIUS_KM:
+            radius *= 4
+            positions, distances = self._within( lat , lon , radius , mask )
+        return self._result( positions[:k] , distances[:k] )
+
+#Spatial index of a frame returned by load_data, built on first use and shared
+def spatial_index(df1):
+    return per_frame( df1 , SpatialIndex )
+
+#=================================================== GeoJSON Layers =======================================================
+
+#GeoJSON FeatureCollection of one point per row, built from whole columns instead of row by row
+#properties: columns copied to each feature, shown client-side by GeoJsonPopup/GeoJsonTooltip
+def feature_collection(df_aux, properties, lat='latitude', lon='longitude'):
+    coordinates = np.column_stack( ( df_aux[lon].to_numpy( dtype=np.float64 ) ,
+                                     df_aux[lat].to_numpy( dtype=np.float64 ) ) ).round( 6 ).tolist()
+    columns = []
+    for col in properties:
+        values = df_aux[col]
+        if pd.api.types.is_float_dtype( values ):
+            values = values.astype( np.float64 ).round( 3 )
+        columns.append( values.tolist() )
+    features = [ { 'type': 'Feature' ,
+                   'geometry': { 'type': 'Point' , 'coordinates': point } ,
+                   'properties': dict( zip( properties , values ) ) }
+                 for point, values in zip( coordinates , zip( *columns ) ) ]
+    return { 'type': 'FeatureCollection' , 'features': features }
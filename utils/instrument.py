@@ -0,0 +1,278 @@
+#===================
+#Libraries
+#===================
+
+import cProfile
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+#===================
+#Functions
+#===================
+
+#Instrumentation is opt-in, PERF_INSTRUMENTATION=1 records the stages of every rerun
+#and shows them in the "Performance" sidebar panel
+ENABLED = os.environ.get( 'PERF_INSTRUMENTATION' , '' ).lower() in ('1', 'true', 'yes')
+
+#Port of the Prometheus text endpoint (GET /metrics), only served when instrumentation is on
+#It listens on localhost unless PERF_METRICS_HOST names another interface (e.g. 0.0.0.0 for a scraper on another host)
+METRICS_PORT = os.environ.get( 'PERF_METRICS_PORT' )
+METRICS_HOST = os.environ.get( 'PERF_METRICS_HOST' ) or '127.0.0.1'
+
+#Structured logs, one JSON object per recorded stage
+logger = logging.getLogger( 'find_a_restaurant.perf' )
+if ENABLED and not logger.handlers:
+    logger.addHandler( logging.StreamHandler() )
+    logger.setLevel( logging.INFO )
+
+#Functions kept in the text summary of a cProfile capture
+PROFILE_LINES = 25
+
+_PAGE_SIZE = os.sysconf( 'SC_PAGE_SIZE' ) if hasattr( os , 'sysconf' ) else 4096
+
+#Resident memory of the process in bytes, None where /proc is not available
+def rss_bytes():
+    try:
+        with open( '/proc/self/statm' ) as file:
+            return int( file.read().split()[1] ) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+#Rows of a stage input or output: frame and array lengths, selected rows of a boolean mask,
+#rows covered by an index (n_rows), None for anything else
+def count_rows(value):
+    if isinstance( value , np.ndarray ) and value.dtype == bool:
+        return int( value.sum() )
+    if isinstance( value , (pd.DataFrame, pd.Series, pd.Index, np.ndarray) ):
+        return len( value )
+    return getattr( value , 'n_rows' , None )
+
+#One timed stage of a rerun, rows_out can be set inside the `with` block
+class Record:
+    def __init__(self, stage, rows_in=None, depth=0):
+        self.stage = stage
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.depth = depth
+        self.wall_ms = None
+        self.memory_delta = None
+
+#Recorded stages of one rerun of a page, with an optional cProfile capture
+class Run:
+    def __init__(self, page, profile=False):
+        self.page = page
+        self.records = []
+        self.depth = 0
+        self.wall_ms = None
+        self.profile = None
+        self.profile_text = None
+        self._start = time.perf_counter()
+        self._profiler = cProfile.Profile() if profile else None
+        if self._profiler is not None:
+            self._profiler.enable()
+
+    #Stages as a frame, nested stages indented under their parent
+    def frame(self):
+        return pd.DataFrame( { 'stage': [ '  ' * r.depth + r.stage for r in self.records ],
+                               'ms': pd.array( [ r.wall_ms for r in self.records ] , dtype='Float64' ).round( 1 ),
+                               'rows in': pd.array( [ r.rows_in for r in self.records ] , dtype='Int64' ),
+                               'rows out': pd.array( [ r.rows_out for r in self.records ] , dtype='Int64' ),
+                               'memory MB': pd.array( [ None if r.memory_delta is None else r.memory_delta / 2**20 for r in self.records ] , dtype='Float64' ).round( 1 ) } )
+
+#Rerun of the current thread, Streamlit runs each session's script in its own thread
+_local = threading.local()
+
+#Run of the current thread, None outside an instrumented run
+def current_run():
+    return getattr( _local , 'run' , None )
+
+#Recording the stages of this thread in `run`, e.g. work a worker thread does for a session
+@contextmanager
+def attached(run):
+    previous = getattr( _local , 'run' , None )
+    _local.run = run
+    try:
+        yield run
+    finally:
+        _local.run = previous
+
+#Starting the instrumented run of a page, None when instrumentation is off
+#profile=True captures the whole rerun with cProfile
+def begin_run(page, profile=False):
+    run = Run( page , profile ) if ENABLED else None
+    _local.run = run
+    if run is not None and METRICS_PORT:
+        serve_metrics( int( METRICS_PORT ) , METRICS_HOST )
+    return run
+
+#Closing a run: stops the profiler, feeds the process metrics and logs every stage
+def end_run(run):
+    if run is None or run.wall_ms is not None:
+        return
+    run.wall_ms = ( time.perf_counter() - run._start ) * 1000
+    if run._profiler is not None:
+        run._profiler.disable()
+        run._profiler.create_stats()
+        run.profile = marshal.dumps( run._profiler.stats )
+        text = io.StringIO()
+        pstats.Stats( run._profiler , stream=text ).sort_stats( 'cumulative' ).print_stats( PROFILE_LINES )
+        run.profile_text = text.getvalue()
+        run._profiler = None
+    if getattr( _local , 'run' , None ) is run:
+        _local.run = None
+    METRICS.add_run( run )
+    for record in run.records:
+        logger.info( json.dumps( { 'page': run.page , 'stage': record.stage , 'depth': record.depth , 'wall_ms': round( record.wall_ms , 3 ) ,
+                                   'rows_in': record.rows_in , 'rows_out': record.rows_out , 'memory_delta_bytes': record.memory_delta } ) )
+
+#Timing a block as a stage of the current run, a no-op outside an instrumented run
+#    with stage( 'filter' , rows_in=len( df1 ) ) as record:
+#        ...
+#        record.rows_out = ...
+@contextmanager
+def stage(name, rows_in=None):
+    run = getattr( _local , 'run' , None )
+    if run is None:
+        yield Record( name , rows_in )
+        return
+    record = Record( name , rows_in , run.depth )
+    run.records.append( record )
+    run.depth += 1
+    memory = rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.wall_ms = ( time.perf_counter() - start ) * 1000
+        after = rss_bytes()
+        record.memory_delta = after - memory if after is not None and memory is not None else None
+        run.depth -= 1
+
+#Decorator recording every call as a '<name>: <function>' stage, e.g. 'filter: shared_mask'
+#Rows are counted on the result and on the positional argument rows_arg (self for methods, see count_rows)
+def instrumented(name, rows_arg=0):
+    def decorate(fn):
+        label = f'{name}: {fn.__qualname__}'
+        @wraps( fn )
+        def wrapper(*args, **kwargs):
+            with stage( label , rows_in=count_rows( args[rows_arg] ) if len( args ) > rows_arg else None ) as record:
+                result = fn( *args , **kwargs )
+                record.rows_out = count_rows( result )
+            return result
+        return wrapper
+    return decorate
+
+#Counters of the caches reported with the stages: stats() key, metric name, type and help
+CACHE_SERIES = [ ( 'hits' , 'cache_hits_total' , 'counter' , 'Lookups answered from the cache.' ),
+                 ( 'misses' , 'cache_misses_total' , 'counter' , 'Lookups not found in the cache.' ),
+                 ( 'evictions' , 'cache_evictions_total' , 'counter' , 'Entries evicted to stay within the cache bounds.' ),
+                 ( 'expirations' , 'cache_expirations_total' , 'counter' , 'Entries dropped after their time to live.' ),
+                 ( 'size' , 'cache_entries' , 'gauge' , 'Entries held by the cache.' ),
+                 ( 'bytes' , 'cache_bytes' , 'gauge' , 'Bytes held by the cache on disk.' ) ]
+
+#Totals per page and stage since the process started, exported in the Prometheus text format
+#along with the stats() of the caches registered with add_cache
+class StageMetrics:
+    def __init__(self):
+        self.stages = {}
+        self.runs = {}
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    def add_cache(self, name, cache):
+        with self._lock:
+            self.caches[name] = cache
+
+    #Current stats() of every registered cache, by name
+    def cache_stats(self):
+        with self._lock:
+            caches = dict( self.caches )
+        return { name: cache.stats() for name, cache in sorted( caches.items() ) }
+
+    def add_run(self, run):
+        with self._lock:
+            count, seconds = self.runs.get( run.page , ( 0 , 0.0 ) )
+            self.runs[run.page] = ( count + 1 , seconds + run.wall_ms / 1000 )
+            for record in run.records:
+                totals = self.stages.setdefault( ( run.page , record.stage ) , [ 0 , 0.0 , 0 , 0 , 0 ] )
+                totals[0] += 1
+                totals[1] += record.wall_ms / 1000
+                totals[2] += record.rows_in or 0
+                totals[3] += record.rows_out or 0
+                totals[4] += record.memory_delta or 0
+
+    def prometheus(self):
+        with self._lock:
+            runs = dict( self.runs )
+            stages = { key: list( totals ) for key, totals in self.stages.items() }
+        lines = [ '# HELP find_a_restaurant_run_seconds Wall time of the page reruns.' , '# TYPE find_a_restaurant_run_seconds summary' ]
+        for page, ( count, seconds ) in sorted( runs.items() ):
+            lines.append( f'find_a_restaurant_run_seconds_count{{page="{page}"}} {count}' )
+            lines.append( f'find_a_restaurant_run_seconds_sum{{page="{page}"}} {seconds:.6f}' )
+        series = [ ( 'stage_seconds' , 'summary' , 'Wall time of the page stages.' , 1 ),
+                   ( 'stage_rows_in_total' , 'counter' , 'Rows received by the page stages.' , 2 ),
+                   ( 'stage_rows_out_total' , 'counter' , 'Rows returned by the page stages.' , 3 ),
+                   ( 'stage_memory_delta_bytes_total' , 'counter' , 'Resident memory change over the page stages.' , 4 ) ]
+        for name, kind, help, position in series:
+            lines += [ f'# HELP find_a_restaurant_{name} {help}' , f'# TYPE find_a_restaurant_{name} {kind}' ]
+            for ( page, stage_name ), totals in sorted( stages.items() ):
+                labels = f'page="{page}",stage="{stage_name}"'
+                if kind == 'summary':
+                    lines.append( f'find_a_restaurant_{name}_count{{{labels}}} {totals[0]}' )
+                    lines.append( f'find_a_restaurant_{name}_sum{{{labels}}} {totals[position]:.6f}' )
+                else:
+                    lines.append( f'find_a_restaurant_{name}{{{labels}}} {totals[position]}' )
+        caches = self.cache_stats()
+        for key, name, kind, help in CACHE_SERIES:
+            lines += [ f'# HELP find_a_restaurant_{name} {help}' , f'# TYPE find_a_restaurant_{name} {kind}' ]
+            for cache, stats in caches.items():
+                if key in stats:
+                    lines.append( f'find_a_restaurant_{name}{{cache="{cache}"}} {stats[key]}' )
+        return '\n'.join( lines ) + '\n'
+
+METRICS = StageMetrics()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error( 404 )
+            return
+        body = METRICS.prometheus().encode()
+        self.send_response( 200 )
+        self.send_header( 'Content-Type' , 'text/plain; version=0.0.4; charset=utf-8' )
+        self.send_header( 'Content-Length' , str( len( body ) ) )
+        self.end_headers()
+        self.wfile.write( body )
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+_server_lock = threading.Lock()
+
+#Serving METRICS on http://<host>:<port>/metrics from a background thread, once per process
+def serve_metrics(port, host=METRICS_HOST):
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server or None
+        try:
+            _server = ThreadingHTTPServer( ( host , port ) , _MetricsHandler )
+        except OSError as error:
+            logger.warning( f'Metrics endpoint not started on {host}:{port}: {error}' )
+            _server = False
+            return None
+        threading.Thread( target=_server.serve_forever , name='perf-metrics' , daemon=True ).start()
+        return _server
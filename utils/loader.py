@@ -0,0 +1,564 @@
+#===================
+#Libraries
+#===================
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import inflection
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from utils.memory import downcast
+from utils.instrument import stage, count_rows, instrumented
+
+#===================
+#Functions
+#===================
+
+#Source:https://www.kaggle.com/datasets/akashram/zomato-restaurants-autoupdated-dataset?resource=download&select=zomato.csv
+CSV_PATH = os.path.join( os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ), 'zomato.csv' )
+
+#Dataset served by the pages, the bundled csv unless ZOMATO_DATA points to another csv
+#or to a directory of csv exports (see Sharded Ingest below)
+DATA_PATH = os.environ.get( 'ZOMATO_DATA' ) or CSV_PATH
+
+#Changing country names
+COUNTRIES = {
+    1: "India",
+    14: "Australia",
+    30: "Brazil",
+    37: "Canada",
+    94: "Indonesia",
+    148: "New Zeland",
+    162: "Philippines",
+    166: "Qatar",
+    184: "Singapure",
+    189: "South Africa",
+    191: "Sri Lanka",
+    208: "Turkey",
+    214: "United Arab Emirates",
+    215: "England",
+    216: "United States of America",
+}
+
+#Creating types for each food price
+PRICE_TYPES = {
+    1: "cheap",
+    2: "normal",
+    3: "expensive",
+}
+
+#Color names
+COLORS = {
+    "3F7E00": "darkgreen",
+    "5BA829": "green",
+    "9ACD32": "lightgreen",
+    "CDD614": "orange",
+    "FFBA00": "red",
+    "CBCBC8": "darkred",
+    "FF7800": "darkred",
+}
+
+#Vectorized lookup of a code column into a categorical of names
+#Codes missing from the mapping become `default` (NaN when no default is given)
+#Categories follow the mapping order, or alphabetical order with sort=True
+def map_categorical(series, mapping, default=None, sort=False):
+    names = series.map( mapping )
+    categories = list( dict.fromkeys( mapping.values() ) )
+    if sort:
+        categories = sorted( categories )
+    if default is not None:
+        names = names.fillna( default )
+        if default not in categories:
+            categories.append( default )
+    return pd.Categorical( names , categories=categories )
+
+#First cuisine of each comma-separated list, as a categorical
+#The split runs once per distinct cuisines string instead of once per row
+def first_cuisine(series):
+    codes, uniques = pd.factorize( series.astype(str) )
+    first = pd.Index( uniques ).str.split(",").str[0]
+    first_codes, first_uniques = pd.factorize( first , sort=True )
+    return pd.Categorical.from_codes( first_codes[codes] , categories=first_uniques )
+
+#Column types of the cleaned frame and of its columnar snapshot
+#Columns that are not listed keep the type pandas gives them
+SCHEMA = {
+    'restaurant_id': 'int64',
+    'country_code': 'int16',
+    'city': 'category',
+    'longitude': 'float32',
+    'latitude': 'float32',
+    'average_cost_for_two': 'int32',
+    'currency': 'category',
+    'has_table_booking': 'int8',
+    'has_online_delivery': 'int8',
+    'is_delivering_now': 'int8',
+    'switch_to_order_menu': 'int8',
+    'price_range': 'int8',
+    'rating_color': 'category',
+    'rating_text': 'category',
+    'cuisine_list': 'category',
+    'votes': 'int32',
+}
+
+#Categorical columns whose categories are the sorted values found in the data
+#(the other categoricals have a fixed list of categories, see clean_data)
+SORTED_CATEGORIES = [ col for col, dtype in SCHEMA.items() if dtype == 'category' ] + ['cuisines']
+
+#Casting the cleaned frame to SCHEMA
+def apply_schema(df1):
+    return df1.astype( { col: dtype for col, dtype in SCHEMA.items() if col in df1.columns } )
+
+#Renaming df columns
+def rename_columns(dataframe):
+    df = dataframe.copy()
+    title = lambda x: inflection.titleize(x)
+    snakecase = lambda x: inflection.underscore(x)
+    spaces = lambda x: x.replace(" ", "")
+    cols_old = list(df.columns)
+    cols_old = list(map(title, cols_old))
+    cols_old = list(map(spaces, cols_old))
+    cols_new = list(map(snakecase, cols_old))
+    df.columns = cols_new
+    return df
+
+#Cleaning the raw zomato frame
+def clean_data(df):
+    df1 = rename_columns(df)
+
+    #Removing null values
+    df1 = df1.dropna()
+
+    #Removing duplicate rows
+    df1 = df1.drop_duplicates()
+
+    return derive_columns(df1)
+
+#Derived columns of the renamed, deduplicated rows, cast to SCHEMA
+def derive_columns(df1):
+    #Keeping the full 'Cuisines' string, then separating elements in 'Cuisines'
+    df1['cuisine_list'] = df1.loc[:, 'cuisines']
+    df1['cuisines'] = first_cuisine(df1.loc[:, 'cuisines'])
+
+    #Creating 'Country' column
+    df1['country'] = map_categorical(df1.loc[:, 'country_code'], COUNTRIES, sort=True)
+
+    #Creating 'Price Type' column
+    df1['price_type'] = map_categorical(df1.loc[:, 'price_range'], PRICE_TYPES, default="gourmet")
+
+    #Swapping color codes with color names
+    df1["color_name"] = map_categorical(df1.loc[:, "rating_color"], COLORS, sort=True)
+
+    return apply_schema(df1)
+
+#=================================================== Chunked Cleaning =======================================================
+
+#Rows read and cleaned at a time by clean_chunks, cleaning memory grows with the chunk, not with the file
+CHUNK_ROWS = 100_000
+
+#Numeric SCHEMA types, applied before fingerprinting so a column parsed as float in one chunk
+#(because of a null dropped afterwards) and as int in another gives the same fingerprints
+NUMERIC_SCHEMA = { col: dtype for col, dtype in SCHEMA.items() if dtype != 'category' }
+
+#64-bit types of the same columns, rows are fingerprinted in them before NUMERIC_SCHEMA narrows them,
+#so values only equal after the downcast (e.g. coordinates closer than float32 precision) stay distinct as in clean_data
+WIDE_SCHEMA = { col: 'float64' if dtype.startswith( 'float' ) else 'int64' for col, dtype in NUMERIC_SCHEMA.items() }
+
+#64-bit fingerprints of the distinct rows seen so far, kept as one sorted array (8 bytes per distinct row)
+#Two different rows share a fingerprint with a probability of about n^2 / 2^65
+class Fingerprints:
+    def __init__(self):
+        self.seen = np.zeros( 0 , dtype=np.uint64 )
+
+    #Rows of the frame not seen before, in this frame or an earlier one, which are then remembered
+    def first_seen(self, df1):
+        hashes = pd.util.hash_pandas_object( df1 , index=False ).to_numpy()
+        unique, first = np.unique( hashes , return_index=True )
+        positions = np.searchsorted( self.seen , unique )
+        known = self.seen[np.minimum( positions , len( self.seen ) - 1 )] == unique if len( self.seen ) else np.zeros( len( unique ) , dtype=bool )
+        self.seen = np.insert( self.seen , positions[~known] , unique[~known] )
+        keep = np.zeros( len( hashes ) , dtype=bool )
+        keep[first[~known]] = True
+        return keep
+
+#Cleaned chunks of a csv, the rows clean_data would keep, `chunk_rows` rows read at a time
+#Each chunk is renamed in place, nulls are dropped, duplicates of rows already seen (in this chunk
+#or an earlier one) are dropped by fingerprint, then the derived columns are added
+#Categories of a chunk only cover that chunk, ColumnarSink merges them
+def clean_chunks(path, chunk_rows=CHUNK_ROWS):
+    fingerprints = Fingerprints()
+    columns = None
+    with pd.read_csv( path , chunksize=chunk_rows ) as reader:
+        for raw in reader:
+            if columns is None:
+                columns = rename_columns( raw.iloc[:0] ).columns
+            raw.columns = columns
+            df1 = raw.dropna().astype( { col: dtype for col, dtype in WIDE_SCHEMA.items() if col in columns } )
+            df1 = df1.loc[fingerprints.first_seen( df1 )]
+            yield derive_columns( df1.astype( { col: dtype for col, dtype in NUMERIC_SCHEMA.items() if col in columns } ) )
+
+#=================================================== Columnar Snapshot =======================================================
+
+#Version of a csv file, changes whenever its mtime or size changes
+#A directory of shards has the names and versions of its csv files as its version
+def file_signature(path):
+    if os.path.isdir( path ):
+        return tuple( ( os.path.basename( shard ) , *file_signature( shard ) ) for shard in shard_paths( path ) )
+    stat = os.stat( path )
+    return ( stat.st_mtime_ns , stat.st_size )
+
+#Version of the dataset served by load_data, used to key cached results
+def data_version(path=DATA_PATH):
+    return file_signature( os.path.abspath( path ) )
+
+#Bumped whenever clean_data or SCHEMA change, so older snapshots are rebuilt
+SNAPSHOT_VERSION = 3
+
+#The snapshot lives next to the csv, e.g. zomato.csv -> zomato.feather
+def snapshot_path(path):
+    return os.path.splitext( path )[0] + '.feather'
+
+#Writing the cleaned frame as an uncompressed feather file, so it can be memory-mapped
+#The snapshot version and csv signature are stored in the schema metadata to detect stale snapshots
+def write_snapshot(df1, path, signature):
+    table = pa.Table.from_pandas( df1 , preserve_index=True )
+    metadata = dict( table.schema.metadata or {} )
+    metadata[b'csv_signature'] = repr( ( SNAPSHOT_VERSION , signature ) ).encode()
+    table = table.replace_schema_metadata( metadata )
+    tmp_path = path + '.tmp'
+    feather.write_feather( table , tmp_path , compression='uncompressed' )
+    os.replace( tmp_path , path )
+
+#Reading the snapshot, None when it is missing, unreadable or built from another csv version
+def read_snapshot(path, signature):
+    if not os.path.exists( path ):
+        return None
+    try:
+        table = feather.read_table( path , memory_map=True )
+    except (OSError, pa.ArrowInvalid):
+        return None
+    metadata = table.schema.metadata or {}
+    if metadata.get( b'csv_signature' ) != repr( ( SNAPSHOT_VERSION , signature ) ).encode():
+        return None
+    df1 = table.to_pandas( split_blocks=True , self_destruct=True )
+    del table
+    for col in json.loads( metadata.get( b'sorted_categories' , b'[]' ) ):
+        df1[col] = df1[col].cat.set_categories( sorted( df1[col].cat.categories ) )
+    return df1
+
+#Columnar sink of cleaned chunks, a feather file written one record batch at a time and renamed once closed
+#Arrow IPC files keep a single dictionary per column, only extended by deltas, so the categories of
+#every chunk are appended to one dictionary per categorical column; the columns listed under
+#b'sorted_categories' in the schema metadata get their categories sorted by read_snapshot
+class ColumnarSink:
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.metadata = dict( metadata or {} )
+        self.rows = 0
+        self._writer = None
+        self._file = None
+        self._categories = {}
+
+    #Empty chunks before the first rows are skipped, their string columns would give the schema a null type
+    def write(self, df1):
+        if self._writer is None:
+            if len( df1 ) == 0:
+                return
+            self._open( df1 )
+        arrays = []
+        for field in self._schema:
+            if field.name in self._categories:
+                arrays.append( self._dictionary( field.name , df1[field.name] ) )
+            else:
+                values = df1.index if field.name == '__index_level_0__' else df1[field.name]
+                arrays.append( pa.array( values , type=field.type , from_pandas=True ) )
+        self._writer.write_batch( pa.record_batch( arrays , schema=self._schema ) )
+        self.rows += len( df1 )
+
+    def _open(self, df1):
+        schema = pa.Schema.from_pandas( df1 , preserve_index=True )
+        for i, field in enumerate( schema ):
+            if pa.types.is_dictionary( field.type ):
+                schema = schema.set( i , pa.field( field.name , pa.dictionary( pa.int32() , field.type.value_type ) ) )
+                self._categories[field.name] = pd.Index( [] , dtype=object )
+        self._schema = schema.with_metadata( { **schema.metadata , **self.metadata } )
+        self._file = pa.OSFile( self.path + '.tmp' , 'wb' )
+        self._writer = pa.ipc.new_file( self._file , self._schema , options=pa.ipc.IpcWriteOptions( emit_dictionary_deltas=True ) )
+
+    #Categorical column as a dictionary array over the categories of every chunk so far
+    def _dictionary(self, col, values):
+        categories = self._categories[col]
+        new = values.cat.categories[categories.get_indexer( values.cat.categories ) < 0]
+        if len( new ):
+            categories = self._categories[col] = categories.append( pd.Index( new , dtype=object ) )
+        codes = categories.get_indexer( values.cat.categories ).astype( np.int32 )[values.cat.codes.to_numpy()]
+        missing = values.cat.codes.to_numpy() < 0
+        return pa.DictionaryArray.from_arrays( pa.array( codes , mask=missing ) , pa.array( categories.to_numpy() ) )
+
+    #Finishing the file, `empty` gives the columns when no chunk was written
+    def close(self, empty=None):
+        if self._writer is None:
+            self._open( empty )
+            self.write( empty )
+        self._writer.close()
+        self._file.close()
+        os.replace( self.path + '.tmp' , self.path )
+        return self.rows
+
+    def discard(self):
+        if self._writer is not None:
+            self._file.close()
+            os.remove( self.path + '.tmp' )
+
+#Streaming a csv into its snapshot, one cleaned chunk at a time
+#Returns the rows written
+def stream_snapshot(path, target, signature, chunk_rows=CHUNK_ROWS):
+    sink = ColumnarSink( target , { b'csv_signature': repr( ( SNAPSHOT_VERSION , signature ) ).encode() ,
+                                    b'sorted_categories': json.dumps( SORTED_CATEGORIES ).encode() } )
+    try:
+        for df1 in clean_chunks( path , chunk_rows ):
+            sink.write( df1 )
+        return sink.close( empty=clean_data( pd.read_csv( path , nrows=0 ) ) )
+    except BaseException:
+        sink.discard()
+        raise
+
+#Snapshot of the csv when it is up to date, otherwise the csv is streamed into a fresh snapshot, which is then read
+#Cleaning memory is bounded by the chunk size, the only full copy of the dataset is the returned frame
+#A directory of shards is read from its partitioned store instead (see ingest_shards)
+def ingest(path=DATA_PATH):
+    path = os.path.abspath( path )
+    if os.path.isdir( path ):
+        return ingest_shards( path )
+    signature = file_signature( path )
+    target = snapshot_path( path )
+
+    with stage( 'read_snapshot' ) as record:
+        df1 = read_snapshot( target , signature )
+        record.rows_out = count_rows( df1 )
+    if df1 is not None:
+        return df1
+
+    try:
+        with stage( 'stream_snapshot' ) as record:
+            record.rows_out = stream_snapshot( path , target , signature )
+    except OSError:
+        #Read-only deployments still work, they just clean the whole csv in memory on every cold start
+        with stage( 'clean' ) as record:
+            df1 = clean_data( pd.read_csv( path ) )
+            record.rows_out = len( df1 )
+        return df1
+    with stage( 'read_snapshot' ) as record:
+        df1 = read_snapshot( target , signature )
+        record.rows_out = count_rows( df1 )
+    return df1
+
+#=================================================== Sharded Ingest =======================================================
+
+#A dataset can be a directory of csv exports (e.g. one per region), ingested in parallel into a
+#partitioned feather store next to it, e.g. feed/ -> feed.store/:
+#  - each shard is cleaned by clean_chunks in a worker process, which writes one file per country code,
+#    feed.store/country_code=<code>/<shard>.feather
+#  - manifest.json keeps the signature of every ingested shard, only new or changed shards are ingested again
+#  - loading concatenates the partitions and keeps the first row of each restaurant_id, shards taken
+#    in name order and rows in file order
+#Shards are the unit of parallelism, so a feed split in at least as many files as cores keeps every core busy
+SHARD_PATTERN = '*.csv'
+MANIFEST = 'manifest.json'
+
+#Csv shards of a directory, in name order
+def shard_paths(path):
+    return sorted( glob.glob( os.path.join( path , SHARD_PATTERN ) ) )
+
+#The store lives next to the shard directory, e.g. feed/ -> feed.store/
+def store_path(path):
+    return os.path.abspath( path ).rstrip( os.sep ) + '.store'
+
+#Partition files of a shard in the store, one per country code
+def shard_partitions(directory, name):
+    return sorted( glob.glob( os.path.join( directory , 'country_code=*' , os.path.splitext( name )[0] + '.feather' ) ) )
+
+#Manifest of the store, None when it is missing, unreadable or written by another SNAPSHOT_VERSION
+def read_manifest(directory):
+    try:
+        with open( os.path.join( directory , MANIFEST ) ) as file:
+            manifest = json.load( file )
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get( 'version' ) == SNAPSHOT_VERSION else None
+
+def write_manifest(directory, manifest):
+    target = os.path.join( directory , MANIFEST )
+    with open( target + '.tmp' , 'w' ) as file:
+        json.dump( manifest , file , indent=1 )
+    os.replace( target + '.tmp' , target )
+
+#Cleaning one shard and writing its partitions, run in a worker process
+#The shard is streamed through clean_chunks, each chunk appended to the partition of its country code
+#Returns the rows written per country code
+def ingest_shard(path, directory):
+    name = os.path.splitext( os.path.basename( path ) )[0] + '.feather'
+    sinks = {}
+    try:
+        for df1 in clean_chunks( path ):
+            for code, part in df1.groupby( 'country_code' , sort=True ):
+                if code not in sinks:
+                    folder = os.path.join( directory , f'country_code={code}' )
+                    os.makedirs( folder , exist_ok=True )
+                    sinks[code] = ColumnarSink( os.path.join( folder , name ) )
+                sinks[code].write( part )
+        return { str( code ): sink.close() for code, sink in sorted( sinks.items() ) }
+    except BaseException:
+        for sink in sinks.values():
+            sink.discard()
+        raise
+
+#Bringing the store of a shard directory up to date, new and changed shards are ingested by `workers` processes
+#(one per core by default), partitions of changed and deleted shards are removed first
+#Returns the names of the shards that were ingested
+def build_store(path, workers=None):
+    path = os.path.abspath( path )
+    directory = store_path( path )
+    os.makedirs( directory , exist_ok=True )
+    manifest = read_manifest( directory ) or { 'version': SNAPSHOT_VERSION , 'shards': {} , 'rows': {} }
+    shards = { os.path.basename( shard ): shard for shard in shard_paths( path ) }
+    signatures = { name: list( file_signature( shard ) ) for name, shard in shards.items() }
+
+    stale = [ name for name in shards if manifest['shards'].get( name ) != signatures[name] ]
+    for name in stale + [ name for name in manifest['shards'] if name not in shards ]:
+        for partition in shard_partitions( directory , name ):
+            os.remove( partition )
+        manifest['shards'].pop( name , None )
+        manifest['rows'].pop( name , None )
+
+    workers = min( workers or os.cpu_count() or 1 , len( stale ) )
+    if workers > 1:
+        #Workers are spawned rather than forked, the server process runs other threads
+        with ProcessPoolExecutor( max_workers=workers , mp_context=multiprocessing.get_context( 'spawn' ) ) as pool:
+            rows = dict( zip( stale , pool.map( ingest_shard , [ shards[name] for name in stale ] , [directory] * len( stale ) ) ) )
+    else:
+        rows = { name: ingest_shard( shards[name] , directory ) for name in stale }
+
+    manifest['shards'].update( { name: signatures[name] for name in stale } )
+    manifest['rows'].update( rows )
+    write_manifest( directory , manifest )
+    return stale
+
+#Cleaned dataset of the store, None when the store does not match the shards
+#The partitions are concatenated by arrow, whose dictionaries become one categorical per column,
+#then categories are trimmed and sorted like clean_data does for a single csv; the index is a range
+def read_store(path):
+    path = os.path.abspath( path )
+    directory = store_path( path )
+    manifest = read_manifest( directory )
+    if manifest is None or tuple( ( name , *signature ) for name, signature in sorted( manifest['shards'].items() ) ) != file_signature( path ):
+        return None
+    tables, ranks = [] , []
+    for rank, name in enumerate( sorted( manifest['shards'] ) ):
+        for partition in shard_partitions( directory , name ):
+            tables.append( feather.read_table( partition , memory_map=True ) )
+            ranks.append( np.full( tables[-1].num_rows , rank ) )
+    if not tables:
+        return None
+    schema = pa.unify_schemas( [ table.schema for table in tables ] , promote_options='permissive' )
+    df1 = pa.concat_tables( [ table.cast( schema ) for table in tables ] ).to_pandas()
+
+    #Shards in name order and rows in file order (the index is the csv row), then the first row of each id
+    df1 = df1.iloc[np.lexsort( ( df1.index.to_numpy() , np.concatenate( ranks ) ) )]
+    df1 = df1.loc[~df1['restaurant_id'].duplicated()].reset_index( drop=True )
+    for col in SORTED_CATEGORIES:
+        categories = df1[col].cat.remove_unused_categories().cat.categories
+        df1[col] = df1[col].cat.set_categories( sorted( categories ) )
+    return df1
+
+#Store of a shard directory when it is up to date, otherwise the changed shards are ingested first
+def ingest_shards(path, workers=None):
+    with stage( 'read_store' ) as record:
+        df1 = read_store( path )
+        record.rows_out = count_rows( df1 )
+    if df1 is not None:
+        return df1
+    with stage( 'build_store' ):
+        build_store( path , workers )
+    with stage( 'read_store' ) as record:
+        df1 = read_store( path )
+        record.rows_out = count_rows( df1 )
+    return df1
+
+#=================================================== Process-wide Cache =======================================================
+
+#One cleaned frame per csv path and column selection, shared by every session of the server process
+_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
+#Cleaned dataset, built once per process and per csv version and downcast to its smallest lossless dtypes
+#With `columns`, only those columns are returned, as a frame sharing the memory of the full one
+#The frames are shared between sessions, so callers must treat them as read-only
+@instrumented( 'load' )
+def load_data(columns=None, path=DATA_PATH):
+    path = os.path.abspath( path )
+    signature = file_signature( path )
+    key = ( path , tuple( columns ) if columns is not None else None )
+
+    entry = _CACHE.get( key )
+    if entry is not None and entry[0] == signature:
+        return entry[1]
+
+    with _CACHE_LOCK:
+        entry = _CACHE.get( key )
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        full = _CACHE.get( ( path , None ) )
+        if full is not None and full[0] == signature:
+            df1 = full[1]
+        else:
+            df1 = downcast( ingest( path ) )
+            _CACHE[( path , None )] = ( signature , df1 )
+        if columns is not None:
+            df1 = project( df1 , columns )
+            _CACHE[key] = ( signature , df1 )
+        return df1
+
+#Columns of a frame as a new frame over the same arrays, no column is copied
+def project(df1, columns):
+    return pd.DataFrame( { col: df1[col] for col in columns } , copy=False )
+
+#Full frame a load_data projection was cut from (the frame itself for any other frame)
+#Projections keep the rows of the full frame in the same order, so row-level structures can be shared
+def source_frame(df1):
+    with _CACHE_LOCK:
+        for ( path, columns ), ( signature, frame ) in _CACHE.items():
+            if columns is not None and frame is df1:
+                full = _CACHE.get( ( path , None ) )
+                return full[1] if full is not None and full[0] == signature else df1
+    return df1
+
+#Dropping every cached frame, the next load_data call rebuilds from disk
+def clear_cache():
+    with _CACHE_LOCK:
+        _CACHE.clear()
+
+#Building the snapshot or the store ahead of time: python -m utils.loader [path/to/zomato.csv | path/to/shards/] [--workers N]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Ingest the dataset into its columnar snapshot or partitioned store.' )
+    parser.add_argument( 'path' , nargs='?' , default=DATA_PATH , help='csv file or directory of csv shards' )
+    parser.add_argument( '--workers' , type=int , default=None , help='worker processes for a shard directory (default: one per core)' )
+    args = parser.parse_args()
+    start = time.perf_counter()
+    if os.path.isdir( args.path ):
+        ingested = build_store( args.path , args.workers )
+        df1 = read_store( args.path )
+        print( f'{store_path( args.path )}: {len( ingested )} shard(s) ingested, {len( df1 )} rows in {time.perf_counter() - start:.1f}s' )
+    else:
+        df1 = ingest( args.path )
+        print( f'{snapshot_path( os.path.abspath( args.path ) )}: {len( df1 )} rows in {time.perf_counter() - start:.1f}s' )
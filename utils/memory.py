@@ -0,0 +1,61 @@
+#===================
+#Libraries
+#===================
+
+import pandas as pd
+import numpy as np
+
+#===================
+#Functions
+#===================
+
+#String columns with fewer distinct values than this share of the rows become categoricals
+CATEGORY_RATIO = 0.5
+
+#Smallest lossless dtype for a single column
+def downcast_column(series):
+    if pd.api.types.is_integer_dtype( series ):
+        return pd.to_numeric( series , downcast='integer' )
+    if pd.api.types.is_float_dtype( series ) and series.dtype != np.float32:
+        #Only when every value survives the round trip, e.g. ratings like 4.6 stay float64
+        narrow = series.astype( np.float32 )
+        if np.array_equal( narrow.astype( series.dtype ).values , series.values , equal_nan=True ):
+            return narrow
+        return series
+    if pd.api.types.is_object_dtype( series ) and len( series ) > 0:
+        if series.nunique() < CATEGORY_RATIO * len( series ):
+            return series.astype( 'category' )
+    return series
+
+#Frame with every column downcast
+def downcast(df):
+    return pd.DataFrame( { col: downcast_column( df[col] ) for col in df.columns } , index=df.index , copy=False )
+
+#Bytes used by each column of a frame, strings included
+def column_bytes(df):
+    return df.memory_usage( index=False , deep=True )
+
+#Bytes saved per column between two versions of the same frame
+#Columns missing from `after` were pruned and count as fully saved, columns only in `after`
+#were derived and count as added, so the totals cover every column of both frames
+def memory_report(before, after):
+    columns = before.columns.append( after.columns.difference( before.columns , sort=False ) )
+    report = pd.DataFrame( index=columns )
+    report['dtype_before'] = before.dtypes.astype(str).reindex( columns ).fillna( 'derived' )
+    report['bytes_before'] = column_bytes( before ).reindex( columns ).fillna( 0 ).astype( 'int64' )
+    report['dtype_after'] = after.dtypes.astype(str).reindex( columns ).fillna( 'pruned' )
+    report['bytes_after'] = column_bytes( after ).reindex( columns ).fillna( 0 ).astype( 'int64' )
+    report['bytes_saved'] = report['bytes_before'] - report['bytes_after']
+    report = report.sort_values( by='bytes_saved' , ascending=False )
+    report.index.name = 'column'
+    return report.reset_index()
+
+#Report for the cached dataset: python -m utils.memory
+#Only the full frame is counted, the column projections of load_data share its memory
+if __name__ == '__main__':
+    from utils.loader import CSV_PATH, load_data, rename_columns
+    plain = rename_columns( pd.read_csv( CSV_PATH ) ).dropna().drop_duplicates()
+    report = memory_report( plain , load_data( path=CSV_PATH ) )
+    pd.set_option( 'display.width' , None )
+    print( report.to_string( index=False ) )
+    print( f"total: {report['bytes_before'].sum()} -> {report['bytes_after'].sum()} bytes" )
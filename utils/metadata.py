@@ -0,0 +1,70 @@
+#===================
+#Libraries
+#===================
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import per_frame
+from utils.cube import BUCKET_WIDTH
+from utils.cuisines import cuisine_map
+from utils.loader import load_data
+
+#===================
+#Functions
+#===================
+
+#Distinct values of the filterable columns with their number of restaurants, used to build the sidebars
+#  - countries, cities and cuisines (every listed cuisine) as counts indexed by value
+#  - the rating range and a histogram on the slider grid (BUCKET_WIDTH steps)
+#Computed once per dataset version, so the sidebars follow the data without scanning it on every rerun
+class DatasetMetadata:
+    def __init__(self, df1, rating_step=BUCKET_WIDTH):
+        self.rows = len( df1 )
+        self.values = {
+            'country': df1['country'].value_counts( sort=False ).loc[lambda counts: counts > 0].sort_index(),
+            'city': df1['city'].value_counts( sort=False ).loc[lambda counts: counts > 0].sort_index(),
+        }
+        mapping = cuisine_map( df1 )
+        cuisines = pd.Series( np.bincount( mapping.values , minlength=len( mapping.categories ) ) , index=mapping.categories )
+        self.values['cuisines'] = cuisines[cuisines > 0]
+
+        ratings = df1['aggregate_rating'].to_numpy( dtype=np.float64 )
+        self.rating_step = rating_step
+        self.rating_min = float( ratings.min() ) if len( ratings ) else 0.0
+        self.rating_max = float( ratings.max() ) if len( ratings ) else 0.0
+        buckets = np.floor( ratings / rating_step ).astype( np.int64 )
+        histogram = pd.Series( buckets ).value_counts().sort_index()
+        self.ratings = pd.Series( histogram.to_numpy() , index=pd.Index( histogram.index * rating_step , name='aggregate_rating' ) )
+
+    #Restaurants per value of 'country', 'city' or 'cuisines'
+    def counts(self, name):
+        return self.values[name]
+
+    #Option list of a filter, alphabetical or with the most common values first
+    def options(self, name, order='name'):
+        counts = self.values[name]
+        if order == 'popularity':
+            counts = counts.sort_values( ascending=False , kind='stable' )
+        elif order != 'name':
+            raise ValueError( f'Unknown option order {order!r}' )
+        return list( counts.index )
+
+    #The given values that exist in the dataset, e.g. a page's default selection
+    def present(self, name, values):
+        counts = self.values[name]
+        return [ value for value in values if value in counts.index ]
+
+    #format_func for a multiselect, showing the number of restaurants next to each option
+    def label(self, name):
+        counts = self.values[name]
+        return lambda value: f'{value} ({counts.get( value , 0 )})'
+
+    #Upper end of the "rating below" slider, the first grid step above every rating
+    @property
+    def rating_limit(self):
+        return float( ( np.floor( self.rating_max / self.rating_step ) + 1 ) * self.rating_step )
+
+#Metadata of the full cleaned dataset, shared by every page
+def load_metadata():
+    return per_frame( load_data() , DatasetMetadata )
@@ -0,0 +1,88 @@
+#===================
+#Libraries
+#===================
+
+import pandas as pd
+
+from utils.loader import load_data, data_version
+from utils.filters import filter_index, shared_mask
+from utils.cube import load_cube
+from utils.topk import cuisine_ranking, top_k, RESTAURANT_ORDER, RESTAURANT_ASCENDING
+from utils.aggregates import group_aggregate, HOME_METRICS, COUNTRY_METRICS, CITY_METRICS, CUISINE_METRICS
+from utils.cache import AGGREGATES, canonical_key
+from utils.executor import EXECUTOR, shared_result
+
+#===================
+#Functions
+#===================
+
+#Analytics of the dashboard pages, importable by the pages, the HTTP API (utils/server.py) and other services
+#Every query runs on the shared cleaned dataset and takes the sidebar filters as keyword arguments,
+#with the semantics of FilterIndex.mask: None keeps every row, a list keeps the listed values ([] keeps none)
+#and rating_below keeps the ratings strictly below it (on the 0.25 grid for the cube-backed queries)
+#Results are shared by every session through AGGREGATES and computed on the shared EXECUTOR (see utils/executor.py),
+#so sessions asking for the same result at once wait for a single computation
+
+#Columns of the restaurant rows returned by the queries
+RESTAURANT_COLUMNS = ['restaurant_id', 'restaurant_name', 'country', 'city', 'cuisines', 'cuisine_list', 'aggregate_rating', 'votes', 'average_cost_for_two', 'currency']
+
+#Restaurant rows of the row-level queries, shared by every caller
+def restaurants():
+    return load_data( RESTAURANT_COLUMNS )
+
+#Row mask of the filters over restaurants(), shared by every caller through AGGREGATES
+def selected_rows(rating_below=None, country=None, cuisines=None):
+    return shared_mask( filter_index( restaurants() ) , data_version() , rating_below=rating_below , country=country , cuisines=cuisines )
+
+#Cube aggregate of the filters, cube misses of concurrent sessions are batched into one pass by EXECUTOR
+def _aggregate(name, key, metrics, rating_below=None, **selections):
+    cache_key = canonical_key( name , data_version() , rating_below=rating_below , **selections )
+    missing = object()
+    value = AGGREGATES.get( cache_key , missing )
+    if value is missing:
+        value = EXECUTOR.aggregate( load_cube() , key , metrics , rating_below , **selections )
+        AGGREGATES.put( cache_key , value )
+    return value
+
+#Home tiles: restaurants, countries, cities, cuisines and votes of the selection
+def summary(rating_below=None, country=None):
+    return _aggregate( 'summary' , None , HOME_METRICS , rating_below=rating_below , country=country )
+
+#Restaurants, cities, cuisines and means per country (Countries page)
+def country_metrics(rating_below=None, country=None):
+    return _aggregate( 'country_metrics' , 'country' , COUNTRY_METRICS , rating_below=rating_below , country=country )
+
+#Restaurants and cuisines per (city, country) (Cities page)
+def city_metrics(rating_below=None, country=None):
+    return _aggregate( 'city_metrics' , ['city','country'] , CITY_METRICS , rating_below=rating_below , country=country )
+
+#Restaurants rated above `rating` per (city, country) (Cities page)
+#Ratings above a threshold are not answered by the cube, so this one filters the rows
+def city_ratings_above(rating=4.0, country=None):
+    def compute():
+        df1 = restaurants()
+        mask = selected_rows( country=country ) & ( df1['aggregate_rating'].to_numpy() > rating )
+        return group_aggregate( df1.loc[mask, ['restaurant_id','city','country']] , ['city','country'] , { 'restaurant_id': ( 'restaurant_id' , 'nunique' ) } )
+    return shared_result( canonical_key( 'city_ratings_above' , data_version() , rating=rating , country=country ) , compute )
+
+#Mean rating and cost for two per cuisine, a restaurant counting in every cuisine it lists (Cuisines page)
+def cuisine_metrics(rating_below=None, country=None, cuisines=None):
+    return _aggregate( 'cuisine_metrics' , 'cuisines' , CUISINE_METRICS , rating_below=rating_below , country=country , cuisines=cuisines )
+
+#Best restaurant of a cuisine in the selection (rating desc, id asc), None when there is none
+def best_restaurant(cuisine, rating_below=None, country=None, cuisines=None):
+    return shared_result( canonical_key( 'best_restaurant' , data_version() , cuisine=cuisine , rating_below=rating_below , country=country , cuisines=cuisines ) ,
+                          lambda: cuisine_ranking( restaurants() ).best( cuisine , selected_rows( rating_below , country , cuisines ) ) )
+
+#Best restaurant of each given cuisine, cuisines without one are left out
+def best_restaurants(names, rating_below=None, country=None, cuisines=None):
+    found = { name: best_restaurant( name , rating_below , country , cuisines ) for name in names }
+    rows = [ best for best in found.values() if best is not None ]
+    return pd.DataFrame( rows , columns=RESTAURANT_COLUMNS ).assign( best_in=[ name for name, best in found.items() if best is not None ] )
+
+#The k best restaurants of the selection, by rating then votes
+def top_restaurants(k=10, rating_below=None, country=None, cuisines=None):
+    def compute():
+        df1 = restaurants()
+        return top_k( df1.loc[selected_rows( rating_below , country , cuisines ), :] , RESTAURANT_ORDER , k , RESTAURANT_ASCENDING )
+    return shared_result( canonical_key( 'top_restaurants' , data_version() , k=k , rating_below=rating_below , country=country , cuisines=cuisines ) , compute )
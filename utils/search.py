@@ -0,0 +1,195 @@
+#===================
+#Libraries
+#===================
+
+import re
+import unicodedata
+import weakref
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import per_frame
+from utils.instrument import instrumented
+from utils.csr import from_lists, gather
+from utils.topk import top_k
+
+#===================
+#Functions
+#===================
+
+#Searched columns and the weight of a term found in each of them
+SEARCH_FIELDS = {
+    'restaurant_name': 3.0,
+    'cuisine_list': 2.0,
+    'locality_verbose': 1.5,
+    'address': 1.0,
+}
+
+#BM25 parameters: term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+#Share of the final score given to the restaurant rating, the rest is the text relevance
+RATING_WEIGHT = 0.3
+
+#Weight of a query term matched as the prefix of an indexed term, or only through shared trigrams
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.5
+
+#Indexed terms tried per query term, the most frequent ones first
+MAX_EXPANSIONS = 64
+
+#Minimum trigram similarity (Dice coefficient) for a typo to match an indexed term
+FUZZY_THRESHOLD = 0.5
+
+#Letters that Unicode decomposition leaves untouched
+_FOLDS = str.maketrans( { 'ı': 'i', 'ß': 'ss', 'ø': 'o', 'æ': 'ae', 'œ': 'oe', 'đ': 'd', 'ł': 'l', 'þ': 'th' } )
+_TOKEN = re.compile( r'[a-z0-9]+' )
+
+#Lower case text without accents, e.g. "Las Piñas" -> "las pinas", "Döner" -> "doner"
+def fold(text):
+    text = unicodedata.normalize( 'NFKD' , str( text ).lower() ).translate( _FOLDS )
+    return ''.join( char for char in text if not unicodedata.combining( char ) )
+
+def tokenize(text):
+    return _TOKEN.findall( fold( text ) )
+
+#Character trigrams of a term, padded so short terms and word boundaries count too
+def trigrams(term):
+    padded = f'${term}$'
+    return { padded[i:i + 3] for i in range( len( padded ) - 2 ) }
+
+#Inverted index over the text columns of a frame, with BM25 scoring
+#Postings are stored CSR-style per term (document positions plus field-weighted term frequencies),
+#the vocabulary is kept sorted for prefix lookups and a trigram index catches typos
+#Each distinct string is tokenized once, so repeated cities, localities and cuisine lists are cheap
+class SearchIndex:
+    def __init__(self, df1, fields=SEARCH_FIELDS, rating_column='aggregate_rating'):
+        self._frame = weakref.ref( df1 )
+        self.n_docs = len( df1 )
+        self.rating = df1[rating_column].to_numpy( dtype=np.float64 ) if rating_column in df1.columns else np.zeros( self.n_docs )
+        vocabulary = {}
+        doc_parts, term_parts, weight_parts = [], [], []
+        self.doc_length = np.zeros( self.n_docs )
+
+        for col, weight in fields.items():
+            if col not in df1.columns:
+                continue
+            codes, uniques = pd.factorize( df1[col].astype( str ) )
+            unique_terms = [ [ vocabulary.setdefault( token , len( vocabulary ) ) for token in tokenize( text ) ] for text in uniques ]
+            offsets, values = from_lists( unique_terms )
+            valid = np.flatnonzero( codes >= 0 )
+            terms, owners = gather( offsets , values , codes[valid] )
+            doc_parts.append( valid[owners] )
+            term_parts.append( terms )
+            weight_parts.append( np.full( len( terms ) , weight ) )
+            self.doc_length[valid] += weight * ( offsets[codes[valid] + 1] - offsets[codes[valid]] )
+
+        self.terms = list( vocabulary )
+        n_terms = len( self.terms )
+        docs = np.concatenate( doc_parts ) if doc_parts else np.zeros( 0 , dtype=np.int64 )
+        terms = np.concatenate( term_parts ) if term_parts else np.zeros( 0 , dtype=np.int64 )
+        weights = np.concatenate( weight_parts ) if weight_parts else np.zeros( 0 )
+
+        #One posting per (term, document), sorted by term then document
+        keys, inverse = np.unique( terms * max( self.n_docs , 1 ) + docs , return_inverse=True )
+        self.frequency = np.bincount( inverse , weights=weights , minlength=len( keys ) )
+        self.postings = keys % max( self.n_docs , 1 )
+        self.offsets = np.searchsorted( keys // max( self.n_docs , 1 ) , np.arange( n_terms + 1 ) )
+        self.document_frequency = np.diff( self.offsets )
+        self.idf = np.log1p( ( self.n_docs - self.document_frequency + 0.5 ) / ( self.document_frequency + 0.5 ) )
+
+        #BM25 contribution of each posting, so a query only gathers and adds precomputed values
+        average_length = self.doc_length.mean() if self.n_docs else 0.0
+        norm = BM25_K1 * ( 1 - BM25_B + BM25_B * self.doc_length[self.postings] / max( average_length , 1e-9 ) )
+        self.impact = ( np.repeat( self.idf , self.document_frequency ) * self.frequency * ( BM25_K1 + 1 ) / ( self.frequency + norm ) ).astype( np.float32 )
+
+        #Sorted vocabulary for prefix ranges
+        self.sorted_terms = sorted( range( n_terms ) , key=self.terms.__getitem__ )
+        self.sorted_words = [ self.terms[term] for term in self.sorted_terms ]
+
+        #Trigram -> terms, for terms that do not match exactly or by prefix
+        grams = {}
+        term_grams = [ [ grams.setdefault( gram , len( grams ) ) for gram in trigrams( term ) ] for term in self.terms ]
+        self.gram_ids = grams
+        self.gram_count = np.fromiter( ( len( values ) for values in term_grams ) , dtype=np.int64 , count=n_terms )
+        gram_offsets, gram_terms = from_lists( term_grams )
+        order = np.argsort( gram_terms , kind='stable' )
+        self.gram_terms = np.repeat( np.arange( n_terms ) , np.diff( gram_offsets ) )[order]
+        self.gram_offsets = np.searchsorted( gram_terms[order] , np.arange( len( grams ) + 1 ) )
+
+    #Indexed terms matching one query token, as (term ids, match weights)
+    #Exact and prefix matches first, trigram neighbours only when nothing starts with the token
+    def expand(self, token):
+        start = bisect_left( self.sorted_words , token )
+        end = bisect_left( self.sorted_words , token + '\uffff' )
+        if end > start:
+            candidates = np.asarray( self.sorted_terms[start:end] , dtype=np.int64 )
+            #The exact term sorts first in its prefix range and is always kept
+            exact = np.zeros( len( candidates ) , dtype=bool )
+            exact[0] = self.sorted_words[start] == token
+            if len( candidates ) > MAX_EXPANSIONS:
+                keep = np.lexsort( ( -self.document_frequency[candidates] , ~exact ) )[:MAX_EXPANSIONS]
+                candidates, exact = candidates[keep] , exact[keep]
+            return candidates , np.where( exact , 1.0 , PREFIX_WEIGHT )
+
+        query_grams = [ self.gram_ids[gram] for gram in trigrams( token ) if gram in self.gram_ids ]
+        if not query_grams:
+            return np.zeros( 0 , dtype=np.int64 ) , np.zeros( 0 )
+        terms, _ = gather( self.gram_offsets , self.gram_terms , np.asarray( query_grams ) )
+        candidates, shared = np.unique( terms , return_counts=True )
+        similarity = 2 * shared / ( len( trigrams( token ) ) + self.gram_count[candidates] )
+        keep = similarity >= FUZZY_THRESHOLD
+        candidates, similarity = candidates[keep] , similarity[keep]
+        best = np.argsort( -similarity , kind='stable' )[:MAX_EXPANSIONS]
+        return candidates[best] , FUZZY_WEIGHT * similarity[best]
+
+    #BM25 score of every document for one query token, 0 where it does not match
+    #A document matching several expansions of the token keeps the best one
+    def _token_scores(self, token):
+        scores = np.zeros( self.n_docs )
+        terms, weights = self.expand( token )
+        for term, weight in zip( terms , weights ):
+            start, end = self.offsets[term] , self.offsets[term + 1]
+            docs = self.postings[start:end]
+            scores[docs] = np.maximum( scores[docs] , weight * self.impact[start:end] )
+        return scores
+
+    #Positions and scores of the documents matching a query, unordered
+    #Documents matching every token are kept; when none does, the ones matching the most tokens
+    def match(self, query, mask=None):
+        tokens = list( dict.fromkeys( tokenize( query ) ) )
+        if not tokens or not self.n_docs:
+            return np.zeros( 0 , dtype=np.int64 ) , np.zeros( 0 )
+        scores = np.zeros( self.n_docs )
+        matched = np.zeros( self.n_docs , dtype=np.int16 )
+        for token in tokens:
+            token_scores = self._token_scores( token )
+            scores += token_scores
+            matched += token_scores > 0
+        if mask is not None:
+            matched[~mask] = 0
+        best = matched.max()
+        if best == 0:
+            return np.zeros( 0 , dtype=np.int64 ) , np.zeros( 0 )
+        docs = np.flatnonzero( matched == best )
+        return docs , scores[docs]
+
+    #The k best restaurants for a query, ranked by text relevance blended with the rating
+    #mask: boolean row mask of the current filters (FilterIndex.mask), None keeps every row
+    @instrumented( 'search' )
+    def search(self, query, k=20, mask=None):
+        df1 = self._frame()
+        docs, scores = self.match( query , mask )
+        if not len( docs ):
+            return df1.iloc[:0].assign( score=pd.Series( dtype=np.float64 ) )
+        relevance = scores / scores.max()
+        ranking = pd.DataFrame( { 'score': ( 1 - RATING_WEIGHT ) * relevance + RATING_WEIGHT * self.rating[docs] / 5 , 'position': docs } )
+        best = top_k( ranking , ['score', 'position'] , k , ascending=[False, True] )
+        return df1.iloc[best['position'].to_numpy()].assign( score=best['score'].round( 4 ).to_numpy() )
+
+#Search index of a frame returned by load_data, built on first use and shared
+def search_index(df1):
+    return per_frame( df1 , SearchIndex )
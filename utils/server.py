@@ -0,0 +1,301 @@
+#===================
+#Libraries
+#===================
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from utils import queries
+from utils.cache import LRUCache, canonical_key
+from utils.cube import load_cube
+from utils.executor import EXECUTOR
+from utils.instrument import METRICS
+from utils.loader import data_version
+
+#===================
+#Functions
+#===================
+
+#JSON API over utils/queries.py, served by a small asyncio HTTP/1.1 server with keep-alive connections
+#  GET /summary             ?rating_below=&country=
+#  GET /countries           ?rating_below=&country=
+#  GET /cities              ?rating_below=&country=
+#  GET /cities/rated-above  ?rating=4.0&country=
+#  GET /cuisines            ?rating_below=&country=&cuisines=
+#  GET /cuisines/best       ?cuisine=Italian&cuisine=Japanese&rating_below=&country=&cuisines=
+#  GET /restaurants/top     ?k=10&rating_below=&country=&cuisines=
+#  GET /health, GET /metrics (Prometheus text, see utils/instrument.py)
+#List parameters are repeated or comma-separated (country=Brazil&country=India or country=Brazil,India)
+#Lists are paginated with offset/limit and can be ordered with sort=<column> or sort=-<column> (descending)
+#Responses carry an ETag, a matching If-None-Match gets a 304 without a body
+#Queries run on the shared EXECUTOR, the event loop only parses requests and sends cached responses
+
+#Endpoint path -> (query, accepted parameters)
+ENDPOINTS = {
+    '/summary': ( queries.summary , ('rating_below', 'country') ),
+    '/countries': ( queries.country_metrics , ('rating_below', 'country') ),
+    '/cities': ( queries.city_metrics , ('rating_below', 'country') ),
+    '/cities/rated-above': ( queries.city_ratings_above , ('rating', 'country') ),
+    '/cuisines': ( queries.cuisine_metrics , ('rating_below', 'country', 'cuisines') ),
+    '/cuisines/best': ( lambda cuisine, **filters: queries.best_restaurants( cuisine , **filters ) , ('cuisine', 'rating_below', 'country', 'cuisines') ),
+    '/restaurants/top': ( queries.top_restaurants , ('k', 'rating_below', 'country', 'cuisines') ),
+}
+
+#Type of each query parameter, lists accept repeated and comma-separated values
+PARAMETERS = { 'rating_below': float , 'rating': float , 'k': int , 'country': list , 'cuisines': list , 'cuisine': list }
+REQUIRED = { 'cuisine' }
+
+#Page size of the list endpoints
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+MAX_K = 1000
+
+#Responses kept ready to send, and query results kept for every page and order of a request
+RESPONSES = LRUCache( maxsize=4096 )
+RESULTS = LRUCache( maxsize=512 )
+METRICS.add_cache( 'api_responses' , RESPONSES )
+METRICS.add_cache( 'api_results' , RESULTS )
+
+#Browsers and proxies may reuse a response for this many seconds, the ETag revalidates it afterwards
+MAX_AGE = 60
+
+#Largest request head accepted, in bytes
+MAX_HEAD = 16384
+
+STATUS = { 200: 'OK' , 304: 'Not Modified' , 400: 'Bad Request' , 404: 'Not Found' , 405: 'Method Not Allowed' , 500: 'Internal Server Error' }
+
+#A request that cannot be answered, sent back as {"error": message}
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__( message )
+        self.status = status
+
+#Query parameters of an endpoint, typed and validated
+def parse_parameters(query, accepted):
+    raw = parse_qs( query , keep_blank_values=True )
+    unknown = set( raw ) - set( accepted ) - { 'offset' , 'limit' , 'sort' }
+    if unknown:
+        raise RequestError( 400 , f'Unknown parameter(s): {", ".join( sorted( unknown ) )}' )
+    params = {}
+    for name in accepted:
+        if name not in raw:
+            if name in REQUIRED:
+                raise RequestError( 400 , f'Missing parameter: {name}' )
+            continue
+        kind = PARAMETERS[name]
+        if kind is list:
+            params[name] = [ value.strip() for values in raw[name] for value in values.split(',') if value.strip() ]
+            continue
+        try:
+            value = kind( raw[name][-1] )
+        except ValueError:
+            raise RequestError( 400 , f'Invalid value for {name}: {raw[name][-1]!r}' )
+        if isinstance( value , float ) and not math.isfinite( value ):
+            raise RequestError( 400 , f'Invalid value for {name}: {raw[name][-1]!r}' )
+        params[name] = value
+    if not 1 <= params.get( 'k' , 1 ) <= MAX_K:
+        raise RequestError( 400 , f'k must be between 1 and {MAX_K}' )
+    return params, raw
+
+#Pagination and order of a list request
+def parse_page(raw):
+    try:
+        offset = int( raw.get( 'offset' , ['0'] )[-1] )
+        limit = int( raw.get( 'limit' , [str( DEFAULT_LIMIT )] )[-1] )
+    except ValueError:
+        raise RequestError( 400 , 'offset and limit must be integers' )
+    if offset < 0 or not 1 <= limit <= MAX_LIMIT:
+        raise RequestError( 400 , f'offset must be >= 0 and limit between 1 and {MAX_LIMIT}' )
+    return offset, limit, raw.get( 'sort' , [None] )[-1]
+
+#JSON-ready value of a numpy or pandas scalar, NaN becomes null
+def plain(value):
+    if isinstance( value , np.generic ):
+        value = value.item()
+    if isinstance( value , float ) and not math.isfinite( value ):
+        return None
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return value
+
+#Query result as JSON-ready data: a list of records for frames, an object for a single row
+def to_json_data(result):
+    if result is None:
+        return None
+    if isinstance( result , pd.Series ):
+        return { str( key ): plain( value ) for key, value in result.items() }
+    df = result.reset_index() if any( name is not None for name in result.index.names ) else result.reset_index( drop=True )
+    columns = [ str( col ) for col in df.columns ]
+    return [ dict( zip( columns , map( plain , row ) ) ) for row in df.itertuples( index=False , name=None ) ]
+
+#Records of a request before pagination, sorted when asked
+def ordered_records(path, params, sort):
+    query, _ = ENDPOINTS[path]
+    key = canonical_key( path , data_version() , sort=sort , **params )
+    def compute():
+        data = to_json_data( query( **params ) )
+        if sort is not None and isinstance( data , list ):
+            column, descending = sort.lstrip('-') , sort.startswith('-')
+            if data and column not in data[0]:
+                raise RequestError( 400 , f'Unknown sort column: {column}' )
+            #Nulls last in both directions
+            data = sorted( data , key=lambda record: ( record[column] is None , record[column] ) if not descending else ( record[column] is not None , record[column] ) , reverse=descending )
+        return data
+    return RESULTS.get_or_compute( key , compute )
+
+#Endpoint, typed parameters, page and cache key of a GET request target
+def parse_request(target):
+    parts = urlsplit( target )
+    if parts.path in ('/health', '/metrics'):
+        return parts.path , None , None
+    if parts.path not in ENDPOINTS:
+        raise RequestError( 404 , f'Unknown endpoint: {parts.path}' )
+    _, accepted = ENDPOINTS[parts.path]
+    params, raw = parse_parameters( parts.query , accepted )
+    page = parse_page( raw )
+    offset, limit, sort = page
+    return parts.path , ( params , page ) , canonical_key( parts.path , data_version() , offset=offset , limit=limit , sort=sort , **params )
+
+#Status, body, ETag and content type of a special endpoint, None for the query endpoints
+def respond_now(path):
+    if path == '/health':
+        return 200 , b'{"status":"ok"}' , None , 'application/json'
+    if path == '/metrics':
+        return 200 , METRICS.prometheus().encode() , None , 'text/plain; version=0.0.4; charset=utf-8'
+    return None
+
+#Status, body, ETag and content type of a query endpoint, cached per canonical request
+def respond(path, request, key):
+    cached = RESPONSES.get( key )
+    if cached is not None:
+        return cached
+
+    params, ( offset, limit, sort ) = request
+    data = ordered_records( path , params , sort )
+    if isinstance( data , list ):
+        items = data[offset:offset + limit]
+        following = None
+        if offset + limit < len( data ):
+            query = { name: ','.join( value ) if isinstance( value , list ) else value for name, value in params.items() }
+            following = f'{path}?{urlencode( { **query , **( { "sort": sort } if sort else {} ) , "offset": offset + limit , "limit": limit } )}'
+        payload = { 'total': len( data ) , 'offset': offset , 'limit': limit , 'next': following , 'items': items }
+    else:
+        payload = { 'item': data }
+    body = json.dumps( payload , ensure_ascii=False , separators=(',', ':') ).encode()
+    etag = '"' + hashlib.blake2b( body , digest_size=12 ).hexdigest() + '"'
+    response = ( 200 , body , etag , 'application/json' )
+    RESPONSES.put( key , response )
+    return response
+
+#Response of a GET request target: special endpoints and cached responses are answered on the event loop,
+#the others are computed on the shared EXECUTOR (see utils/executor.py), concurrent identical requests
+#waiting for one computation
+async def respond_async(target):
+    path, request, key = parse_request( target )
+    response = respond_now( path )
+    if response is None:
+        response = RESPONSES.get( key )
+    if response is None:
+        response = await asyncio.wrap_future( EXECUTOR.submit( ( 'response' , key ) , respond , path , request , key ) )
+    return response
+
+#Reading past the body of a request, none of the endpoints uses one
+#Returns False when the body cannot be skipped (chunked, malformed or over MAX_HEAD bytes), the connection is then closed after the response
+async def skip_body(reader, headers):
+    if 'transfer-encoding' in headers:
+        return False
+    try:
+        length = int( headers.get( 'content-length' , '0' ) )
+    except ValueError:
+        return False
+    if not 0 <= length <= MAX_HEAD:
+        return False
+    if length:
+        await reader.readexactly( length )
+    return True
+
+#Bytes of an HTTP/1.1 response
+def http_response(status, body, etag=None, content_type='application/json', keep_alive=True):
+    head = [ f'HTTP/1.1 {status} {STATUS.get( status , "" )}' ,
+             f'Content-Type: {content_type}' ,
+             f'Content-Length: {len( body )}' ,
+             f'Connection: {"keep-alive" if keep_alive else "close"}' ]
+    if etag is not None:
+        head += [ f'ETag: {etag}' , f'Cache-Control: public, max-age={MAX_AGE}' ]
+    return ( '\r\n'.join( head ) + '\r\n\r\n' ).encode( 'latin-1' ) + body
+
+#One client connection, requests are answered in order until the client closes it
+async def handle(reader, writer):
+    try:
+        while True:
+            try:
+                head = await reader.readuntil( b'\r\n\r\n' )
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                break
+            lines = head.decode( 'latin-1' ).split( '\r\n' )
+            try:
+                method, target, version = lines[0].split( ' ' )
+            except ValueError:
+                writer.write( http_response( 400 , b'{"error":"Malformed request line"}' , keep_alive=False ) )
+                break
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition( ':' )
+                if name:
+                    headers[name.strip().lower()] = value.strip()
+            keep_alive = headers.get( 'connection' , '' ).lower() != 'close' and version == 'HTTP/1.1'
+            try:
+                keep_alive = await skip_body( reader , headers ) and keep_alive
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+
+            if method not in ('GET', 'HEAD'):
+                status, body, etag, content_type = 405 , b'{"error":"Only GET is supported"}' , None , 'application/json'
+            else:
+                try:
+                    status, body, etag, content_type = await respond_async( target )
+                except RequestError as error:
+                    status, body, etag, content_type = error.status , json.dumps( { 'error': str( error ) } ).encode() , None , 'application/json'
+                except ValueError as error:
+                    #Filters the queries reject, e.g. a rating_below off the cube grid
+                    status, body, etag, content_type = 400 , json.dumps( { 'error': str( error ) } ).encode() , None , 'application/json'
+                except Exception:
+                    status, body, etag, content_type = 500 , b'{"error":"Internal error"}' , None , 'application/json'
+            if etag is not None and headers.get( 'if-none-match' ) == etag:
+                status, body = 304 , b''
+            response = http_response( status , body , etag , content_type , keep_alive )
+            if method == 'HEAD':
+                response = response[:len( response ) - len( body )]
+            writer.write( response )
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+
+#Serving the API until interrupted, the dataset and cube are loaded before the first request
+async def serve(host='127.0.0.1', port=8000):
+    load_cube()
+    queries.selected_rows()
+    server = await asyncio.start_server( handle , host , port , limit=MAX_HEAD )
+    async with server:
+        await server.serve_forever()
+
+#Running the API: python -m utils.server [--host 127.0.0.1] [--port 8000]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='JSON API over the restaurant dataset.' )
+    parser.add_argument( '--host' , default='127.0.0.1' )
+    parser.add_argument( '--port' , type=int , default=8000 )
+    args = parser.parse_args()
+    print( f'Serving on http://{args.host}:{args.port}' )
+    try:
+        asyncio.run( serve( args.host , args.port ) )
+    except KeyboardInterrupt:
+        pass
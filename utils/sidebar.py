@@ -0,0 +1,105 @@
+#===================
+#Libraries
+#===================
+
+import pandas as pd
+import streamlit as st
+
+from utils.instrument import METRICS, begin_run, end_run
+
+#===================
+#Functions
+#===================
+
+#Session state key of the applied filters, shared by every page of a session
+FILTERS_KEY = 'filters'
+
+#Session state key asking for a cProfile capture of the next rerun
+PROFILE_KEY = 'profile_next_run'
+
+#Filters of a page before the user applies any, the same values sidebar_filters starts from
+#  - rating: use the "rating below" filter (default: every rating)
+#  - countries: default selection, None for every country, False to hide the filter
+#  - cuisines: default selection, None for every cuisine (no cuisine filter), False to hide the filter
+#Returns {'rating_below', 'country', 'cuisines'}, hidden filters are None
+#cuisines is None for every cuisine on every page, an empty selection is never returned
+def default_filters(metadata, rating=True, countries=None, cuisines=False):
+    return {
+        'rating_below': metadata.rating_limit if rating else None,
+        'country': None if countries is False else metadata.options('country') if countries is None else metadata.present( 'country' , countries ),
+        'cuisines': None if not cuisines else metadata.present( 'cuisines' , cuisines ) or None,
+    }
+
+#Filters a page shows in its sidebar, for the same arguments as default_filters
+def shown_filters(rating=True, countries=None, cuisines=False):
+    return { 'rating_below': bool( rating ) , 'country': countries is not False , 'cuisines': cuisines is not False }
+
+#Whether an applied value is the one the form started from, selections compare as sets
+def unchanged(value, start):
+    if isinstance( value , list ) and isinstance( start , list ):
+        return set( value ) == set( start )
+    return value == start
+
+#Sidebar filters shared by every page, inside a form so the page only reruns on "Apply"
+#Only the filters the user changed are kept in the session and carried over to the next page;
+#the others start at each page's default (see default_filters)
+#Returns {'rating_below', 'country', 'cuisines'}, hidden filters are None
+def sidebar_filters(metadata, rating=True, countries=None, cuisines=False):
+    applied = st.session_state.setdefault( FILTERS_KEY , {} )
+    defaults = default_filters( metadata , rating , countries , cuisines )
+    shown = shown_filters( rating , countries , cuisines )
+    current = { name: applied.get( name , default ) if shown[name] else None for name, default in defaults.items() }
+    if shown['rating_below']:
+        current['rating_below'] = min( current['rating_below'] , metadata.rating_limit )
+
+    values = {}
+    with st.sidebar.form( 'filters' ):
+        #Rating Filters
+        if shown['rating_below']:
+            values['rating_below'] = st.slider( 'Sort by Rating:', min_value=None, max_value=metadata.rating_limit,
+                                                value=current['rating_below'], step=metadata.rating_step,
+                                                label_visibility="visible" )
+            st.markdown("""---""")
+
+        #Country Filters
+        if shown['country']:
+            values['country'] = st.multiselect( 'Select Countries:', metadata.options('country'),
+                                                default=metadata.present( 'country' , current['country'] ), format_func=metadata.label('country') )
+            st.markdown("""---""")
+
+        #Cuisine Filter, no cuisine selected keeps every cuisine
+        if shown['cuisines']:
+            values['cuisines'] = st.multiselect( 'Select Cuisines:', metadata.options('cuisines', order='popularity'),
+                                                 default=metadata.present( 'cuisines' , current['cuisines'] or [] ), format_func=metadata.label('cuisines') ) or None
+            st.markdown("""---""")
+
+        submitted = st.form_submit_button( 'Apply' )
+
+    if submitted:
+        applied.update( { name: value for name, value in values.items() if not unchanged( value , current[name] ) } )
+        current.update( values )
+    return current
+
+#Instrumented run of a page (see utils/instrument.py), profiled when the previous rerun asked for it
+#None unless PERF_INSTRUMENTATION=1
+def page_run(page):
+    return begin_run( page , profile=st.session_state.pop( PROFILE_KEY , False ) )
+
+#Collapsible "Performance" panel at the bottom of the sidebar, closing the run
+#Lists the stages of this rerun and, after "Profile next rerun", the cProfile capture
+def performance_panel(run):
+    if run is None:
+        return
+    end_run( run )
+    with st.sidebar.expander( 'Performance' ):
+        st.dataframe( run.frame() , use_container_width=True , hide_index=True )
+        st.caption( f'Rerun: {run.wall_ms:.0f} ms. Nested stages are indented and included in their parent. Memory is the change in resident memory.' )
+        caches = pd.DataFrame.from_dict( METRICS.cache_stats() , orient='index' )
+        st.dataframe( caches.rename_axis( 'cache' ).reset_index() , use_container_width=True , hide_index=True )
+        st.caption( 'Shared caches of the process since it started.' )
+        if run.profile is not None:
+            st.text( run.profile_text )
+            st.download_button( 'Download profile (.prof)' , run.profile , file_name=f'{run.page}.prof' )
+        if st.button( 'Profile next rerun' ):
+            st.session_state[PROFILE_KEY] = True
+            st.experimental_rerun()
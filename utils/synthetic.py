@@ -0,0 +1,199 @@
+#===================
+#Libraries
+#===================
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.loader import CSV_PATH, COUNTRIES
+
+#===================
+#Functions
+#===================
+
+#Header of zomato.csv, the generated files use the same columns in the same order
+ZOMATO_COLUMNS = ['Restaurant ID', 'Restaurant Name', 'Country Code', 'City', 'Address', 'Locality', 'Locality Verbose',
+                  'Longitude', 'Latitude', 'Cuisines', 'Average Cost for two', 'Currency', 'Has Table booking',
+                  'Has Online delivery', 'Is delivering now', 'Switch to order menu', 'Price range', 'Aggregate rating',
+                  'Rating color', 'Rating text', 'Votes']
+
+#Lowest rating of each rating color (the COLORS codes of utils/loader.py), 0.0 being the restaurants that are not rated yet
+RATING_BANDS = [ (0.0, 'CBCBC8'), (2.0, 'FF7800'), (2.5, 'FFBA00'), (3.0, 'CDD614'), (3.5, '9ACD32'), (4.0, '5BA829'), (4.5, '3F7E00') ]
+
+#Share of full-row duplicates in zomato.csv (585 of 7527 rows)
+DUPLICATE_RATE = 0.078
+
+#Share of restaurants named after an existing one (chains), the others get a new name
+CHAIN_RATE = 0.3
+
+#Rows generated and written at a time, memory stays bounded by one chunk whatever the file size
+CHUNK_ROWS = 100_000
+
+#First restaurant id of the generated rows, above every id of zomato.csv
+FIRST_ID = 100_000_000
+
+#Distributions of zomato.csv, the generator draws every row from them
+#Each generated row starts from a random source row (its template), so the joint distribution of
+#city, currency, cost, price range, rating, votes and the booking/delivery flags stays realistic, then:
+#  - the pin is drawn around the median location of the city, with the city's spread
+#  - the cuisines are a new list of the template's length, drawn from the country's cuisine popularity
+#  - the rating moves by up to 0.1, its color and text follow RATING_BANDS and the country's language
+#  - votes and cost for two are scaled by random factors, the name is new unless it is a chain
+class ZomatoProfile:
+    def __init__(self, raw):
+        raw = raw.loc[raw['Country Code'].isin( list( COUNTRIES ) ), ZOMATO_COLUMNS].drop_duplicates().reset_index( drop=True )
+        self.templates = { col: raw[col].to_numpy() for col in ZOMATO_COLUMNS }
+        self.n_templates = len( raw )
+
+        #City centers and spreads, robust to the few pins placed far from their city
+        city_codes, cities = pd.factorize( pd.MultiIndex.from_frame( raw[['Country Code', 'City']] ) )
+        coordinates = raw[['Latitude', 'Longitude']].groupby( city_codes )
+        self.city = city_codes
+        self.center = coordinates.median().to_numpy()
+        spread = ( raw[['Latitude', 'Longitude']] - self.center[city_codes] ).abs().groupby( city_codes ).median() * 1.4826
+        self.spread = np.clip( spread.to_numpy() , 0.002 , 0.1 )
+
+        #Cuisine popularity per country, smoothed with the worldwide popularity so new combinations appear
+        country_codes, self.countries = pd.factorize( raw['Country Code'] )
+        self.country = country_codes
+        lists = raw['Cuisines'].fillna( '' ).str.split( ',' ).map( lambda names: [ n.strip() for n in names if n.strip() ] )
+        self.lengths = lists.map( len ).to_numpy()
+        entries = pd.DataFrame( { 'country': np.repeat( country_codes , self.lengths ) , 'cuisine': np.concatenate( lists.to_numpy() ) } )
+        counts = pd.crosstab( entries['country'] , entries['cuisine'] ).reindex( range( len( self.countries ) ) , fill_value=0 )
+        self.cuisines = counts.columns.to_numpy( dtype=object )
+        weights = counts.to_numpy( dtype=np.float64 ) + 0.02 * counts.to_numpy().sum( axis=0 )
+        self.cuisine_cdf = np.cumsum( weights , axis=1 ) / weights.sum( axis=1 , keepdims=True )
+
+        #Rating text of each color in each country, the most common one in the source
+        colors = [ color for _, color in RATING_BANDS ]
+        texts = raw.groupby( ['Country Code', 'Rating color'] )['Rating text'].agg( lambda text: text.mode().iloc[0] )
+        fallback = raw.groupby( 'Rating color' )['Rating text'].agg( lambda text: text.mode().iloc[0] )
+        self.rating_text = np.array( [ [ texts.get( ( code , color ) , fallback.get( color , '' ) ) for color in colors ] for code in self.countries ] , dtype=object )
+        self.rating_bounds = np.array( [ bound for bound, _ in RATING_BANDS ] )
+        self.rating_colors = np.array( colors , dtype=object )
+
+        #Name parts, first words and endings of the multi-word source names
+        words = raw['Restaurant Name'].str.split( ' ' , n=1 )
+        self.name_starts = words.str[0].to_numpy( dtype=object )
+        self.name_ends = words[words.str.len() > 1].str[1].to_numpy( dtype=object )
+
+    @classmethod
+    def from_csv(cls, path=CSV_PATH):
+        return cls( pd.read_csv( path ) )
+
+    #Cuisine lists of the given countries and lengths, most popular cuisines being more likely first
+    def draw_cuisines(self, rng, country, lengths):
+        lists = np.empty( len( country ) , dtype=object )
+        draws = rng.random( ( len( country ) , 3 * max( int( lengths.max( initial=0 ) ) , 1 ) ) )
+        picks = np.empty( draws.shape , dtype=np.int64 )
+        for code in np.unique( country ):
+            rows = country == code
+            picks[rows] = np.minimum( np.searchsorted( self.cuisine_cdf[code] , draws[rows] ) , len( self.cuisines ) - 1 )
+        for i, ( row, length ) in enumerate( zip( picks , lengths ) ):
+            lists[i] = ', '.join( self.cuisines[list( dict.fromkeys( row.tolist() ) )[:length]] ) if length else np.nan
+        return lists
+
+    #One chunk of n rows, ids start at first_id
+    def chunk(self, rng, n, first_id=FIRST_ID, duplicate_rate=DUPLICATE_RATE):
+        t = rng.integers( 0 , self.n_templates , n )
+        template = { col: values[t] for col, values in self.templates.items() }
+        city, country = self.city[t] , self.country[t]
+
+        location = self.center[city] + rng.standard_normal( ( n , 2 ) ) * self.spread[city]
+        rating = template['Aggregate rating']
+        rating = np.where( rating > 0 , np.clip( np.round( rating + rng.choice( [-0.1, 0.0, 0.1] , n , p=[0.25, 0.5, 0.25] ) , 1 ) , 2.0 , 4.9 ) , 0.0 )
+        band = np.searchsorted( self.rating_bounds , rating + 1e-9 , side='right' ) - 1
+        cost = template['Average Cost for two'] * rng.uniform( 0.8 , 1.25 , n )
+        step = 10.0 ** np.maximum( np.floor( np.log10( np.maximum( cost , 1 ) ) ) - 1 , 0 )
+        chain = rng.random( n ) < CHAIN_RATE
+        names = np.where( chain , template['Restaurant Name'] ,
+                          self.name_starts[rng.integers( 0 , len( self.name_starts ) , n )] + ' ' + self.name_ends[rng.integers( 0 , len( self.name_ends ) , n )] )
+
+        columns = {
+            'Restaurant ID': first_id + np.arange( n , dtype=np.int64 ),
+            'Restaurant Name': names,
+            'Country Code': template['Country Code'],
+            'City': template['City'],
+            'Address': pd.Series( rng.integers( 1 , 500 , n ) ).astype( str ).to_numpy( dtype=object ) + ', ' + template['Address'],
+            'Locality': template['Locality'],
+            'Locality Verbose': template['Locality Verbose'],
+            'Longitude': np.round( np.clip( location[:, 1] , -180 , 180 ) , 10 ),
+            'Latitude': np.round( np.clip( location[:, 0] , -90 , 90 ) , 10 ),
+            'Cuisines': self.draw_cuisines( rng , country , self.lengths[t] ),
+            'Average Cost for two': ( np.round( cost / step ) * step ).astype( np.int64 ),
+            'Currency': template['Currency'],
+            'Has Table booking': template['Has Table booking'],
+            'Has Online delivery': template['Has Online delivery'],
+            'Is delivering now': template['Is delivering now'],
+            'Switch to order menu': template['Switch to order menu'],
+            'Price range': template['Price range'],
+            'Aggregate rating': rating,
+            'Rating color': self.rating_colors[band],
+            'Rating text': self.rating_text[country, band],
+            'Votes': np.where( rating > 0 , np.round( template['Votes'] * rng.lognormal( 0 , 0.35 , n ) ) , template['Votes'] ).astype( np.int64 ),
+        }
+
+        #Full-row copies of other rows of the chunk, like the duplicates of the source
+        duplicates = rng.choice( n , rng.binomial( n , duplicate_rate ) , replace=False )
+        originals = rng.integers( 0 , n , len( duplicates ) )
+        for values in columns.values():
+            values[duplicates] = values[originals]
+        return pd.DataFrame( columns )
+
+#Chunks of a synthetic dataset of `rows` rows, chunk i is drawn from the seed and i alone,
+#so the same seed and chunk size always give the same rows
+def generate_chunks(rows, seed=0, chunk_rows=CHUNK_ROWS, profile=None, duplicate_rate=DUPLICATE_RATE):
+    profile = profile if profile is not None else ZomatoProfile.from_csv()
+    for i, start in enumerate( range( 0 , rows , chunk_rows ) ):
+        rng = np.random.default_rng( [seed, i] )
+        yield profile.chunk( rng , min( chunk_rows , rows - start ) , first_id=FIRST_ID + start , duplicate_rate=duplicate_rate )
+
+#Writing a synthetic dataset to a csv shaped like zomato.csv, one chunk at a time
+#The file is written next to its final path and renamed once complete
+def write_csv(path, rows, seed=0, chunk_rows=CHUNK_ROWS, profile=None, duplicate_rate=DUPLICATE_RATE):
+    tmp_path = path + '.tmp'
+    with open( tmp_path , 'w' , encoding='utf-8' , newline='' ) as file:
+        for i, chunk in enumerate( generate_chunks( rows , seed , chunk_rows , profile , duplicate_rate ) ):
+            chunk.to_csv( file , index=False , header=( i == 0 ) )
+        if rows == 0:
+            pd.DataFrame( columns=ZOMATO_COLUMNS ).to_csv( file , index=False )
+    os.replace( tmp_path , path )
+    return path
+
+#Writing a synthetic dataset as `shards` csv files in a directory, like a sharded export (see utils/loader.py)
+#Chunks are dealt to the shards in turn, so the shards have about the same size and the rows are those of write_csv
+def write_shards(directory, rows, shards, seed=0, chunk_rows=CHUNK_ROWS, profile=None, duplicate_rate=DUPLICATE_RATE):
+    os.makedirs( directory , exist_ok=True )
+    chunk_rows = max( 1 , min( chunk_rows , -( -rows // shards ) ) )
+    paths = [ os.path.join( directory , f'zomato_{i:03d}.csv' ) for i in range( shards ) ]
+    files = [ open( path + '.tmp' , 'w' , encoding='utf-8' , newline='' ) for path in paths ]
+    try:
+        for i, chunk in enumerate( generate_chunks( rows , seed , chunk_rows , profile , duplicate_rate ) ):
+            chunk.to_csv( files[i % shards] , index=False , header=( i < shards ) )
+        for i in range( len( range( 0 , rows , chunk_rows ) ) , shards ):
+            pd.DataFrame( columns=ZOMATO_COLUMNS ).to_csv( files[i] , index=False )
+    finally:
+        for file in files:
+            file.close()
+    for path in paths:
+        os.replace( path + '.tmp' , path )
+    return paths
+
+#Writing a synthetic dataset: python -m utils.synthetic output.csv ROWS [--seed 0] [--chunk-rows 100000]
+#With --shards N, output is a directory of N csv files
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Generate a synthetic dataset with the zomato.csv schema.' )
+    parser.add_argument( 'output' , help='csv file to write, or directory with --shards' )
+    parser.add_argument( 'rows' , type=int , help='number of rows, duplicates included' )
+    parser.add_argument( '--seed' , type=int , default=0 )
+    parser.add_argument( '--chunk-rows' , type=int , default=CHUNK_ROWS , help='rows generated and written at a time' )
+    parser.add_argument( '--duplicate-rate' , type=float , default=DUPLICATE_RATE , help='share of full-row duplicates' )
+    parser.add_argument( '--shards' , type=int , default=None , help='number of csv files to split the rows into' )
+    args = parser.parse_args()
+    if args.shards:
+        write_shards( args.output , args.rows , args.shards , args.seed , args.chunk_rows , duplicate_rate=args.duplicate_rate )
+    else:
+        write_csv( args.output , args.rows , args.seed , args.chunk_rows , duplicate_rate=args.duplicate_rate )
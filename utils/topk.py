@@ -0,0 +1,106 @@
+#===================
+#Libraries
+#===================
+
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import per_frame
+from utils.cuisines import cuisine_map
+
+#===================
+#Functions
+#===================
+
+#Order of the restaurant rankings: best rating first, then most votes, then lowest id
+RESTAURANT_ORDER = ['aggregate_rating', 'votes', 'restaurant_id']
+RESTAURANT_ASCENDING = [False, False, True]
+
+#Column values as floats that sort ascending in the requested direction, nulls last
+def _sort_key(series, ascending):
+    if pd.api.types.is_numeric_dtype( series ) and not isinstance( series.dtype , pd.CategoricalDtype ):
+        values = series.to_numpy( dtype=np.float64 , na_value=np.nan )
+    else:
+        codes, _ = pd.factorize( series , sort=True )
+        values = np.where( codes >= 0 , codes , np.nan ).astype( np.float64 )
+    if not ascending:
+        values = -values
+    return np.where( np.isnan( values ) , np.inf , values )
+
+#The k first rows of df.sort_values(by, ascending=ascending), without sorting the whole frame
+#The first column is partitioned with np.argpartition-style selection in O(n), only the
+#candidates tied with the k-th value are sorted. Ties are broken by the remaining `by`
+#columns and finally by row position, so the result is deterministic
+def top_k(df, by, k, ascending=False):
+    by = [by] if isinstance( by , str ) else list( by )
+    ascending = [ascending] * len( by ) if isinstance( ascending , bool ) else list( ascending )
+    n_rows = len( df )
+    if k <= 0 or n_rows == 0:
+        return df.iloc[:0]
+
+    keys = [ _sort_key( df[col] , asc ) for col, asc in zip( by , ascending ) ]
+    if k < n_rows:
+        kth = np.partition( keys[0] , k - 1 )[k - 1]
+        candidates = np.flatnonzero( keys[0] <= kth )
+    else:
+        candidates = np.arange( n_rows )
+
+    #np.lexsort sorts by the last key first
+    order = np.lexsort( [ candidates ] + [ key[candidates] for key in reversed( keys ) ] )
+    return df.iloc[candidates[order[:k]]]
+
+#The k last rows of the same ranking, i.e. the smallest values first
+def bottom_k(df, by, k):
+    return top_k( df , by , k , ascending=True )
+
+#Order of the per-cuisine best restaurant: best rating first, then lowest id
+BEST_ORDER = ['aggregate_rating', 'restaurant_id']
+BEST_ASCENDING = [False, True]
+
+#Restaurants of each cuisine, pre-sorted by BEST_ORDER (rating desc, id asc)
+#A restaurant is ranked in every cuisine it lists, through the cuisine mapping
+#best() walks a cuisine's list and stops at the first restaurant kept by the current filters,
+#so the header costs the same whatever the number of cuisines shown
+#Like FilterIndex, it only keeps a weak reference to its frame
+class CuisineRanking:
+    def __init__(self, df1):
+        self._frame = weakref.ref( df1 )
+        mapping = cuisine_map( df1 )
+        rows = mapping.owners
+        keys = [ _sort_key( df1[col] , asc ) for col, asc in zip( BEST_ORDER , BEST_ASCENDING ) ]
+        self.order = rows[np.lexsort( [ rows ] + [ key[rows] for key in reversed( keys ) ] + [ mapping.values ] )]
+        bounds = mapping.bounds
+        self.ranges = { value: ( bounds[i] , bounds[i + 1] ) for i, value in enumerate( mapping.categories ) }
+
+    #Row positions of a cuisine's restaurants, best first
+    def ranked(self, cuisine):
+        start, end = self.ranges.get( cuisine , ( 0 , 0 ) )
+        return self.order[start:end]
+
+    #Best restaurant of a cuisine among the rows where `mask` is True (all rows when None)
+    #Returns the row as a Series, or None when no restaurant of that cuisine passes the filters
+    def best(self, cuisine, mask=None):
+        positions = self.ranked( cuisine )
+        if mask is not None:
+            #Checking growing chunks, most lookups stop in the first one
+            start, size = 0, 16
+            found = None
+            while start < len( positions ) and found is None:
+                chunk = positions[start:start + size]
+                hits = np.flatnonzero( mask[chunk] )
+                if len( hits ):
+                    found = chunk[hits[0]]
+                start, size = start + size, size * 4
+            if found is None:
+                return None
+        elif len( positions ):
+            found = positions[0]
+        else:
+            return None
+        return self._frame().iloc[found]
+
+#Cuisine ranking of a frame returned by load_data, built on first use and shared
+def cuisine_ranking(df1):
+    return per_frame( df1 , CuisineRanking )